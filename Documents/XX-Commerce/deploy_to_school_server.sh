@@ -9,19 +9,87 @@ echo "🚀 Deploying XX-Commerce to school server..."
 SCHOOL_SERVER="student_user18@172.16.6.100"
 SCHOOL_PATH="/home/student_user18/XX-Commerce"
 
-# Files to deploy
+# Files to deploy: every module, migration, template and script changed since the last deploy
 FILES=(
-    "templates/store/category_list.html"
+    "static/js/main.js"
+    "store/admin.py"
+    "store/admin_views.py"
+    "store/apps.py"
+    "store/backends/__init__.py"
+    "store/backends/sqlite3/__init__.py"
+    "store/backends/sqlite3/base.py"
+    "store/cache.py"
+    "store/cart_merge.py"
+    "store/cart_storage.py"
     "store/cart_views.py"
+    "store/checkout.py"
+    "store/context_processors.py"
+    "store/db.py"
+    "store/export_jobs.py"
+    "store/exports.py"
+    "store/imports.py"
+    "store/management/commands/backfill_order_rollups.py"
+    "store/management/commands/benchmark_sqlite.py"
+    "store/management/commands/cleanup_carts.py"
+    "store/management/commands/import_products.py"
+    "store/management/commands/rebuild_search_index.py"
+    "store/management/commands/refresh_replica.py"
+    "store/management/commands/release_expired_reservations.py"
+    "store/management/commands/run_export_worker.py"
+    "store/middleware.py"
+    "store/migrations/0002_product_search_index.py"
+    "store/migrations/0003_product_keyset_indexes.py"
+    "store/migrations/0004_cart_totals.py"
+    "store/migrations/0005_product_primary_image.py"
+    "store/migrations/0006_category_path.py"
+    "store/migrations/0007_stock_reservations.py"
+    "store/migrations/0008_order_daily_rollup.py"
+    "store/migrations/0009_customer_stats.py"
+    "store/migrations/0010_export_jobs.py"
+    "store/migrations/0011_address_search_indexes.py"
+    "store/migrations/0012_price_changes.py"
+    "store/migrations/0013_drop_redundant_product_indexes.py"
+    "store/migrations/0014_active_cart_constraints.py"
+    "store/migrations/0015_export_private_storage.py"
+    "store/migrations/0016_autocomplete_lower_indexes.py"
     "store/models.py"
-    "store/management/commands/cleanup_duplicate_carts.py"
+    "store/order_numbers.py"
+    "store/page_cache.py"
+    "store/pagination.py"
+    "store/pricing.py"
+    "store/reservations.py"
+    "store/rollups.py"
+    "store/routers.py"
+    "store/search.py"
+    "store/sessions.py"
+    "store/signals.py"
+    "store/urls.py"
+    "store/views.py"
+    "store/wishlist_views.py"
+    "templates/admin/base_site.html"
+    "templates/admin/bulk_price_update.html"
+    "templates/admin/customer_analytics.html"
+    "templates/admin/export_jobs.html"
+    "templates/admin/import_products.html"
+    "templates/base.html"
+    "templates/store/cart.html"
+    "templates/store/category_list.html"
+    "templates/store/checkout.html"
+    "templates/store/home.html"
+    "templates/store/order_detail.html"
+    "templates/store/order_list.html"
+    "templates/store/product_detail.html"
+    "templates/store/product_list.html"
+    "xxcommerce/settings.py"
     "xxcommerce/urls.py"
-    "store/admin.py"
-    "store/apps.py"
 )
 
 echo "📁 Copying files to school server..."
 
+# New packages (store/backends/sqlite3) need their directories on the server first
+DIRS=$(for file in "${FILES[@]}"; do dirname "$file"; done | sort -u)
+ssh "$SCHOOL_SERVER" "cd $SCHOOL_PATH && mkdir -p $(echo $DIRS)"
+
 # Copy each file
 for file in "${FILES[@]}"; do
     echo "Copying $file..."
@@ -39,12 +107,15 @@ echo "🔧 Running commands on school server..."
 ssh "$SCHOOL_SERVER" << 'EOF'
 cd /home/student_user18/XX-Commerce
 
+echo "Running migrations up to the active cart constraints..."
+python3 manage.py migrate store 0013
+
+echo "Merging duplicate carts..."
+python3 manage.py cleanup_carts
+
 echo "Running migrations..."
 python3 manage.py migrate
 
-echo "Cleaning up duplicate carts..."
-python3 manage.py cleanup_duplicate_carts
-
 echo "Collecting static files..."
 python3 manage.py collectstatic --noinput
 
@@ -110,8 +110,32 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Cart functionality
     initializeCart();
+
+    // Per-visitor data for pages served from the shared page cache
+    loadSessionFragment();
 });
 
+function loadSessionFragment() {
+    const url = document.body.dataset.sessionFragmentUrl;
+    if (!url) {
+        return;
+    }
+
+    fetch(url, { credentials: 'same-origin' })
+    .then(response => response.json())
+    .then(data => {
+        // The cached page carries someone else's CSRF token
+        document.querySelectorAll('input[name="csrfmiddlewaretoken"]').forEach(input => {
+            input.value = data.csrf_token;
+        });
+        const cartBadge = document.querySelector('.navbar .badge');
+        if (cartBadge) {
+            cartBadge.textContent = data.cart_items;
+        }
+    })
+    .catch(error => console.error('Error:', error));
+}
+
 // Cart functionality
 function initializeCart() {
     // Add to cart forms
@@ -1,22 +1,93 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
 from django.utils.html import format_html
 from django.urls import reverse, path
 from django.utils.safestring import mark_safe
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Sum, Count, Avg, Q
+from django.db.models import Sum, Count, Avg, Q, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Lower
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal, InvalidOperation
 import json
-import csv
 from .models import (
     Category, Product, ProductImage, Address, Cart, CartItem, 
-    Order, OrderItem, Coupon, Wishlist
+    StockReservation, Order, OrderItem, Coupon, Wishlist, ExportJob, PriceChange
 )
+from .cache import bump_catalog_version
+from .page_cache import product_listing_tags, purge_tags
+from .reservations import release_holds
+from .rollups import order_days, refresh_days
+from .exports import EXPORTS, stream_export
+from .search import search_products
+from .pricing import update_prices
+
+
+def is_autocomplete_request(request):
+    """Whether the admin is answering an autocomplete widget lookup."""
+    return request.resolver_match is not None and request.resolver_match.url_name == 'autocomplete'
+
+
+def _prefix_upper_bound(prefix):
+    """The smallest string greater than every string starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _autocomplete_match(model, field, term, prefix):
+    """Q matching rows of `model` whose Lower(field) starts with or equals `term`.
+
+    A field on a related model ("user__username") becomes an IN subquery on
+    the foreign key, so each branch of the OR can use its own index instead
+    of the join forcing a scan.
+    """
+    if '__' in field:
+        relation, field = field.split('__', 1)
+        related = model._meta.get_field(relation).related_model
+        return Q(**{f'{relation}__in': related.objects.filter(_autocomplete_match(related, field, term, prefix))})
+    alias = f'{field}_lower'
+    lowered = model.objects.alias(**{alias: Lower(field)})
+    if prefix:
+        match = {f'{alias}__gte': term, f'{alias}__lt': _prefix_upper_bound(term)}
+    else:
+        match = {alias: term}
+    return Q(pk__in=lowered.filter(**match).values('pk'))
+
+
+class AutocompleteSearchMixin:
+    """Search `autocomplete_search_fields` when serving autocomplete widgets.
+
+    Entries are prefix ("^field") or exact ("=field") matches, compared
+    case-insensitively as a range or equality on Lower(field). Unlike the
+    LIKE that "^"/"=" produce in search_fields, that is served by an index
+    on Lower(field), so the lookup stays fast on large tables. The changelist
+    search box keeps the broader `search_fields`.
+    """
+    autocomplete_search_fields = []
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip().lower()
+        if not (is_autocomplete_request(request) and self.autocomplete_search_fields and term):
+            return super().get_search_results(request, queryset, search_term)
+
+        condition = Q()
+        for spec in self.autocomplete_search_fields:
+            condition |= _autocomplete_match(queryset.model, spec[1:], term, prefix=spec.startswith('^'))
+        return queryset.filter(condition), False
+
+
+class StoreUserAdmin(AutocompleteSearchMixin, UserAdmin):
+    autocomplete_search_fields = ['^username', '=email']
+
+
+admin.site.unregister(User)
+admin.site.register(User, StoreUserAdmin)
 
 
 @admin.register(Category)
@@ -26,6 +97,8 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['name', 'slug', 'description']
     prepopulated_fields = {'slug': ('name',)}
     list_editable = ['is_active']
+    list_select_related = ['parent']
+    autocomplete_fields = ['parent']
     ordering = ['name']
     
     def has_add_permission(self, request):
@@ -58,12 +131,27 @@ class ProductAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     list_editable = ['price', 'compare_price', 'stock_quantity', 'is_active', 'is_featured']
     inlines = [ProductImageInline]
+    list_select_related = ['category']
+    autocomplete_fields = ['category']
     ordering = ['-created_at']
     actions = [
         'make_active', 'make_inactive', 'make_featured', 'make_unfeatured', 
         'restock_products', 'bulk_price_update', 'export_products', 'duplicate_products'
     ]
     
+    def get_search_results(self, request, queryset, search_term):
+        # Autocomplete widgets search the full-text index (name, SKU, descriptions)
+        if is_autocomplete_request(request) and search_term:
+            return search_products(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
+    
+    def get_queryset(self, request):
+        # Units sold as a correlated subquery, so the changelist needs no per-row aggregate
+        sold = OrderItem.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        return super().get_queryset(request).annotate(
+            total_sold=Coalesce(Subquery(sold.annotate(total=Sum('quantity')).values('total')), 0)
+        )
+    
     def price_yen(self, obj):
         return f"¥{obj.price:,.0f}"
     price_yen.short_description = 'Price (JPY)'
@@ -77,56 +165,71 @@ class ProductAdmin(admin.ModelAdmin):
     compare_price_yen.admin_order_field = 'compare_price'
     
     def make_active(self, request, queryset):
+        tags = product_listing_tags(queryset)
         updated = queryset.update(is_active=True)
+        bump_catalog_version()
+        purge_tags(*tags)
         self.message_user(request, f'{updated} products were successfully marked as active.')
     make_active.short_description = "Mark selected products as active"
     
     def make_inactive(self, request, queryset):
+        tags = product_listing_tags(queryset)
         updated = queryset.update(is_active=False)
+        bump_catalog_version()
+        purge_tags(*tags)
         self.message_user(request, f'{updated} products were successfully marked as inactive.')
     make_inactive.short_description = "Mark selected products as inactive"
     
     def make_featured(self, request, queryset):
+        tags = product_listing_tags(queryset)
         updated = queryset.update(is_featured=True)
+        bump_catalog_version()
+        purge_tags(*tags)
         self.message_user(request, f'{updated} products were successfully marked as featured.')
     make_featured.short_description = "Mark selected products as featured"
     
     def make_unfeatured(self, request, queryset):
+        tags = product_listing_tags(queryset)
         updated = queryset.update(is_featured=False)
+        bump_catalog_version()
+        purge_tags(*tags)
         self.message_user(request, f'{updated} products were successfully marked as unfeatured.')
     make_unfeatured.short_description = "Mark selected products as unfeatured"
     
     def get_sales_count(self, obj):
         """Display total sales count for this product."""
-        from django.db.models import Sum
-        total_sold = OrderItem.objects.filter(product=obj).aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
-        return f"{total_sold:,}"
+        return f"{obj.total_sold:,}"
     get_sales_count.short_description = 'Total Sold'
-    get_sales_count.admin_order_field = 'orderitem__quantity'
+    get_sales_count.admin_order_field = 'total_sold'
     
     def restock_products(self, request, queryset):
         """Restock selected products to a default quantity."""
         restock_quantity = 100  # Default restock quantity
+        tags = product_listing_tags(queryset)
         updated = queryset.update(stock_quantity=restock_quantity)
+        bump_catalog_version()
+        purge_tags(*tags)
         self.message_user(request, f'{updated} products were restocked to {restock_quantity} units.')
     restock_products.short_description = "Restock selected products to 100 units"
     
     def bulk_price_update(self, request, queryset):
         """Bulk update prices for selected products."""
         if request.POST.get('post'):
-            price_increase = float(request.POST.get('price_increase', 0))
-            price_multiplier = float(request.POST.get('price_multiplier', 1.0))
-            
-            updated = 0
-            for product in queryset:
-                if price_increase > 0:
-                    product.price += price_increase
-                if price_multiplier != 1.0:
-                    product.price *= price_multiplier
-                product.save()
-                updated += 1
+            try:
+                updated = update_prices(
+                    queryset,
+                    increase=Decimal(request.POST.get('price_increase') or '0'),
+                    multiplier=Decimal(request.POST.get('price_multiplier') or '1'),
+                    rounding=request.POST.get('rounding', 'cent'),
+                    user=request.user,
+                )
+            except InvalidOperation:
+                messages.error(request, 'Prices were not updated: enter valid numbers.')
+                return
+            except ValidationError as e:
+                for message in e.messages:
+                    messages.error(request, message)
+                return
             
             self.message_user(request, f'{updated} products were updated.')
             return
@@ -134,50 +237,32 @@ class ProductAdmin(admin.ModelAdmin):
         context = {
             'queryset': queryset,
             'action_name': 'bulk_price_update',
+            'rounding_choices': PriceChange.ROUNDING_CHOICES,
         }
         return render(request, 'admin/bulk_price_update.html', context)
     bulk_price_update.short_description = "Bulk update prices"
     
     def export_products(self, request, queryset):
         """Export selected products to CSV."""
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="products_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Name', 'SKU', 'Category', 'Price', 'Compare Price', 'Stock', 
-            'Active', 'Featured', 'Created At'
-        ])
-        
-        for product in queryset:
-            writer.writerow([
-                product.name,
-                product.sku,
-                product.category.name,
-                product.price,
-                product.compare_price or '',
-                product.stock_quantity,
-                product.is_active,
-                product.is_featured,
-                product.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            ])
-        
-        return response
+        return stream_export(EXPORTS['products'], queryset=queryset)
     export_products.short_description = "Export selected products to CSV"
     
     def duplicate_products(self, request, queryset):
         """Duplicate selected products."""
         duplicated = 0
         for product in queryset:
+            images = list(product.images.all())
+            
             # Create a copy
             product.pk = None
+            product.primary_image = None
             product.name = f"{product.name} (Copy)"
             product.sku = f"{product.sku}_COPY_{timezone.now().strftime('%Y%m%d%H%M%S')}"
             product.slug = f"{product.slug}-copy-{timezone.now().strftime('%Y%m%d%H%M%S')}"
             product.save()
             
             # Copy images
-            for image in product.images.all():
+            for image in images:
                 image.pk = None
                 image.product = product
                 image.save()
@@ -224,6 +309,7 @@ class ProductImageAdmin(admin.ModelAdmin):
     list_display = ['product', 'image_preview', 'is_primary', 'sort_order', 'created_at']
     list_filter = ['is_primary', 'created_at']
     list_editable = ['is_primary', 'sort_order']
+    autocomplete_fields = ['product']
     ordering = ['product', 'sort_order']
 
     def image_preview(self, obj):
@@ -237,20 +323,28 @@ class ProductImageAdmin(admin.ModelAdmin):
 
 
 @admin.register(Address)
-class AddressAdmin(admin.ModelAdmin):
+class AddressAdmin(AutocompleteSearchMixin, admin.ModelAdmin):
     list_display = [
         'user', 'address_type', 'first_name', 'last_name', 
         'city', 'state', 'is_default', 'created_at'
     ]
     list_filter = ['address_type', 'is_default', 'country', 'created_at']
     search_fields = ['user__username', 'first_name', 'last_name', 'city', 'state']
+    autocomplete_search_fields = ['^last_name', '^postal_code', '^user__username']
+    autocomplete_fields = ['user']
     ordering = ['-created_at']
 
 
 class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
+    autocomplete_fields = ['product']
     readonly_fields = ['line_total']
+    
+    def line_total(self, obj):
+        # The blank "add another" row has no price yet
+        return obj.line_total if obj.pk else '-'
+    line_total.short_description = 'Line total'
 
 
 @admin.register(Cart)
@@ -260,12 +354,19 @@ class CartAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'session_key']
     inlines = [CartItemInline]
     readonly_fields = ['total_items', 'total_price']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
     ordering = ['-created_at']
     
+    def total_items(self, obj):
+        return obj.total_items
+    total_items.short_description = 'Total items'
+    total_items.admin_order_field = 'item_count'
+    
     def total_price_yen(self, obj):
         return f"¥{obj.total_price:,.0f}"
     total_price_yen.short_description = 'Total (JPY)'
-    total_price_yen.admin_order_field = 'total_price'
+    total_price_yen.admin_order_field = 'subtotal'
 
 
 @admin.register(CartItem)
@@ -273,18 +374,51 @@ class CartItemAdmin(admin.ModelAdmin):
     list_display = ['cart', 'product', 'quantity', 'line_total_yen', 'created_at']
     list_filter = ['created_at']
     search_fields = ['cart__user__username', 'product__name']
+    list_select_related = ['cart__user', 'product']
+    autocomplete_fields = ['cart', 'product']
     ordering = ['-created_at']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            line_total_amount=F('quantity') * F('product__price')
+        )
+    
     def line_total_yen(self, obj):
         return f"¥{obj.line_total:,.0f}"
     line_total_yen.short_description = 'Line Total (JPY)'
-    line_total_yen.admin_order_field = 'line_total'
+    line_total_yen.admin_order_field = 'line_total_amount'
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['product', 'cart', 'quantity', 'expires_at', 'created_at']
+    list_filter = ['expires_at']
+    search_fields = ['product__name', 'product__sku', 'cart__user__username']
+    list_select_related = ['product', 'cart__user']
+    ordering = ['expires_at']
+    readonly_fields = ['cart', 'product', 'quantity', 'expires_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def delete_model(self, request, obj):
+        release_holds(StockReservation.objects.filter(pk=obj.pk))
+    
+    def delete_queryset(self, request, queryset):
+        # Deleting rows directly would leave the units counted in reserved_quantity
+        release_holds(queryset)
 
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
+    autocomplete_fields = ['product']
     readonly_fields = ['line_total']
+    
+    def line_total(self, obj):
+        # The blank "add another" row has no price yet
+        return obj.line_total if obj.pk else '-'
+    line_total.short_description = 'Line total'
 
 
 @admin.register(Order)
@@ -297,69 +431,69 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['order_number', 'user__username', 'tracking_number']
     readonly_fields = ['order_number', 'total_items', 'created_at', 'updated_at']
     inlines = [OrderItemInline]
+    autocomplete_fields = ['user', 'shipping_address', 'billing_address']
     ordering = ['-created_at']
     actions = [
         'mark_as_processing', 'mark_as_shipped', 'mark_as_delivered', 'mark_as_cancelled',
         'export_orders', 'send_tracking_emails', 'bulk_status_update'
     ]
     
+    def get_queryset(self, request):
+        # Item totals as a correlated subquery, so the changelist needs no per-row aggregate
+        items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        return super().get_queryset(request).select_related(
+            'user', 'shipping_address', 'billing_address'
+        ).annotate(
+            items_sold=Coalesce(Subquery(items.annotate(total=Sum('quantity')).values('total')), 0)
+        )
+    
     def total_amount_yen(self, obj):
         return f"¥{obj.total_amount:,.0f}"
     total_amount_yen.short_description = 'Total (JPY)'
     total_amount_yen.admin_order_field = 'total_amount'
     
+    def total_items(self, obj):
+        return obj.items_sold
+    total_items.short_description = 'Total items'
+    total_items.admin_order_field = 'items_sold'
+    
     def get_items_sold(self, obj):
         """Display total items sold in this order."""
-        from django.db.models import Sum
-        total_items = obj.items.aggregate(total=Sum('quantity'))['total'] or 0
-        return f"{total_items:,}"
+        return f"{obj.items_sold:,}"
     get_items_sold.short_description = 'Items Sold'
-    get_items_sold.admin_order_field = 'items__quantity'
+    get_items_sold.admin_order_field = 'items_sold'
     
     def mark_as_processing(self, request, queryset):
+        days = order_days(queryset)
         updated = queryset.update(status='processing')
+        refresh_days(days)
         self.message_user(request, f'{updated} orders were marked as processing.')
     mark_as_processing.short_description = "Mark selected orders as processing"
     
     def mark_as_shipped(self, request, queryset):
+        days = order_days(queryset)
         updated = queryset.update(status='shipped')
+        refresh_days(days)
         self.message_user(request, f'{updated} orders were marked as shipped.')
     mark_as_shipped.short_description = "Mark selected orders as shipped"
     
     def mark_as_delivered(self, request, queryset):
+        days = order_days(queryset)
         updated = queryset.update(status='delivered')
+        refresh_days(days)
         self.message_user(request, f'{updated} orders were marked as delivered.')
     mark_as_delivered.short_description = "Mark selected orders as delivered"
     
     def mark_as_cancelled(self, request, queryset):
+        days = order_days(queryset)
         updated = queryset.update(status='cancelled')
+        refresh_days(days)
         self.message_user(request, f'{updated} orders were marked as cancelled.')
     mark_as_cancelled.short_description = "Mark selected orders as cancelled"
     
     def export_orders(self, request, queryset):
         """Export selected orders to CSV."""
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="orders_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Order Number', 'Customer', 'Status', 'Payment Status', 'Total Amount',
-            'Items Count', 'Created At', 'Tracking Number'
-        ])
-        
-        for order in queryset:
-            writer.writerow([
-                order.order_number,
-                order.user.username if order.user else 'Guest',
-                order.status,
-                order.payment_status,
-                order.total_amount,
-                order.total_items,
-                order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                order.tracking_number or ''
-            ])
-        
-        return response
+        return stream_export(EXPORTS['orders'], queryset=queryset)
     export_orders.short_description = "Export selected orders to CSV"
     
     def send_tracking_emails(self, request, queryset):
@@ -377,7 +511,9 @@ class OrderAdmin(admin.ModelAdmin):
         """Bulk update order status."""
         if request.POST.get('post'):
             new_status = request.POST.get('new_status')
+            days = order_days(queryset)
             updated = queryset.update(status=new_status)
+            refresh_days(days)
             self.message_user(request, f'{updated} orders were updated to {new_status}.')
             return
         
@@ -408,9 +544,6 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user', 'shipping_address', 'billing_address')
-
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
@@ -418,8 +551,15 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['order__order_number', 'product_name', 'product_sku']
     readonly_fields = ['line_total']
+    list_select_related = ['order']
+    autocomplete_fields = ['order', 'product']
     ordering = ['-created_at']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            line_total_amount=F('quantity') * F('price')
+        )
+    
     def price_yen(self, obj):
         return f"¥{obj.price:,.0f}"
     price_yen.short_description = 'Price (JPY)'
@@ -428,7 +568,7 @@ class OrderItemAdmin(admin.ModelAdmin):
     def line_total_yen(self, obj):
         return f"¥{obj.line_total:,.0f}"
     line_total_yen.short_description = 'Line Total (JPY)'
-    line_total_yen.admin_order_field = 'line_total'
+    line_total_yen.admin_order_field = 'line_total_amount'
 
 
 @admin.register(Coupon)
@@ -460,7 +600,41 @@ class WishlistAdmin(admin.ModelAdmin):
     list_display = ['user', 'product', 'created_at']
     list_filter = ['created_at']
     search_fields = ['user__username', 'product__name']
+    autocomplete_fields = ['user', 'product']
+    ordering = ['-created_at']
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'export_type', 'status', 'requested_by', 'processed_rows', 'total_rows', 'created_at', 'finished_at']
+    list_filter = ['export_type', 'status', 'created_at']
+    search_fields = ['requested_by__username']
+    ordering = ['-created_at']
+    readonly_fields = [
+        'export_type', 'status', 'requested_by', 'start_date', 'end_date', 'total_rows',
+        'processed_rows', 'file', 'error', 'started_at', 'finished_at', 'created_at', 'updated_at'
+    ]
+    
+    def has_add_permission(self, request):
+        # Jobs are queued from the export page
+        return False
+
+
+@admin.register(PriceChange)
+class PriceChangeAdmin(admin.ModelAdmin):
+    list_display = ['id', 'changed_by', 'increase', 'multiplier', 'rounding', 'products_updated', 'created_at']
+    list_filter = ['rounding', 'created_at']
+    search_fields = ['changed_by__username']
+    list_select_related = ['changed_by']
     ordering = ['-created_at']
+    readonly_fields = [
+        'changed_by', 'increase', 'multiplier', 'rounding', 'product_ids', 'products_updated',
+        'created_at', 'updated_at'
+    ]
+    
+    def has_add_permission(self, request):
+        # Written by the bulk price update action
+        return False
 
 
 # Customize admin site
@@ -1,17 +1,25 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Sum, Count, Avg, Q, F
+from django.http import FileResponse
+from django.db.models import Sum, Count, Q, F
 from django.utils import timezone
 from django.core.paginator import Paginator
-from datetime import timedelta
-from .models import Product, Order, OrderItem, Category, User, Cart, Wishlist
+from django.db.models.functions import TruncDate
+from datetime import datetime, timedelta
+from .models import Product, Order, OrderItem, Category, User, Cart, Wishlist, ExportJob
+from .cache import bump_catalog_version
+from .page_cache import product_listing_tags, purge_tags
+from .rollups import daily_series, rollup_totals, status_counts
+from .exports import EXPORTS, export_options
+from .export_jobs import enqueue_export
+from .imports import IMPORT_FIELDS, guess_format, import_products
+from .routers import read_from_replica
 from django.contrib.auth.decorators import user_passes_test
 import json
-import csv
 
 @staff_member_required
+@read_from_replica
 def sales_dashboard(request):
     """Sales dashboard for admin users."""
     
@@ -20,17 +28,13 @@ def sales_dashboard(request):
     week_ago = today - timedelta(days=7)
     month_ago = today - timedelta(days=30)
     
-    # Sales statistics
-    total_orders = Order.objects.count()
-    total_revenue = Order.objects.aggregate(
-        total=Sum('total_amount')
-    )['total'] or 0
+    # Sales statistics, read from the daily rollups
+    totals = rollup_totals()
+    total_orders = totals['orders']
+    total_revenue = totals['revenue']
     
     # Recent sales (last 7 days)
-    recent_orders = Order.objects.filter(created_at__date__gte=week_ago)
-    recent_revenue = recent_orders.aggregate(
-        total=Sum('total_amount')
-    )['total'] or 0
+    recent_revenue = rollup_totals(since=week_ago)['revenue']
     
     # Top selling products
     top_products = Product.objects.annotate(
@@ -43,9 +47,7 @@ def sales_dashboard(request):
     ).filter(total_sales__gt=0).order_by('-total_sales')
     
     # Order status distribution
-    order_status = Order.objects.values('status').annotate(
-        count=Count('id')
-    ).order_by('-count')
+    order_status = status_counts()
     
     # Low stock products
     low_stock_products = Product.objects.filter(
@@ -101,35 +103,50 @@ def inventory_management(request):
     return render(request, 'admin/inventory_management.html', context)
 
 @staff_member_required
+@read_from_replica
 def customer_analytics(request):
     """Customer analytics and management page."""
     
+    # Reporting window (?days=7/30/90/365); query count does not depend on it
+    window = request.GET.get('days', '30')
+    window = int(window) if window in ('7', '30', '90', '365') else 30
+    today = timezone.localdate()
+    window_start = today - timedelta(days=window - 1)
+    
     # Customer statistics
     total_customers = User.objects.filter(is_active=True).count()
     new_customers_this_month = User.objects.filter(
         date_joined__gte=timezone.now().replace(day=1)
     ).count()
     
-    # Top customers by order count
-    top_customers = User.objects.annotate(
-        order_count=Count('orders'),
-        total_spent=Sum('orders__total_amount')
-    ).filter(order_count__gt=0).order_by('-total_spent')[:10]
-    
-    # Customer registration trends (last 30 days)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
+    # Top customers by spend, read from the maintained per-customer stats
+    top_customers = User.objects.filter(
+        customer_stats__order_count__gt=0
+    ).annotate(
+        order_count=F('customer_stats__order_count'),
+        total_spent=F('customer_stats__total_spent'),
+        last_order_at=F('customer_stats__last_order_at'),
+    ).order_by('-customer_stats__total_spent')[:10]
+    
+    # Customer registration trends, one grouped query for the whole window
+    registrations = dict(
+        User.objects.filter(
+            date_joined__gte=timezone.make_aware(datetime.combine(window_start, datetime.min.time()))
+        ).annotate(day=TruncDate('date_joined'))
+        .values('day').annotate(count=Count('id')).order_by()
+        .values_list('day', 'count')
+    )
     daily_registrations = []
-    for i in range(30):
-        date = thirty_days_ago + timedelta(days=i)
-        count = User.objects.filter(date_joined__date=date.date()).count()
+    for i in range(window):
+        date = window_start + timedelta(days=i)
         daily_registrations.append({
             'date': date.strftime('%Y-%m-%d'),
-            'count': count
+            'count': registrations.get(date, 0)
         })
     
     # Customer activity
     active_customers = User.objects.filter(
-        last_login__gte=timezone.now() - timedelta(days=30)
+        last_login__gte=timezone.now() - timedelta(days=window)
     ).count()
     
     context = {
@@ -138,11 +155,14 @@ def customer_analytics(request):
         'top_customers': top_customers,
         'daily_registrations': daily_registrations,
         'active_customers': active_customers,
+        'window': window,
+        'window_choices': [7, 30, 90, 365],
     }
     
     return render(request, 'admin/customer_analytics.html', context)
 
 @staff_member_required
+@read_from_replica
 def product_analytics(request):
     """Product analytics and performance page."""
     
@@ -185,52 +205,40 @@ def product_analytics(request):
     return render(request, 'admin/product_analytics.html', context)
 
 @staff_member_required
+@read_from_replica
 def order_analytics(request):
     """Order analytics and management page."""
     
-    # Order statistics
-    total_orders = Order.objects.count()
-    pending_orders = Order.objects.filter(status='pending').count()
-    processing_orders = Order.objects.filter(status='processing').count()
-    shipped_orders = Order.objects.filter(status='shipped').count()
-    delivered_orders = Order.objects.filter(status='delivered').count()
+    # Order statistics, read from the daily rollups
+    status_distribution = list(status_counts())
+    by_status = {row['status']: row['count'] for row in status_distribution}
+    totals = rollup_totals()
+    total_orders = totals['orders']
+    pending_orders = by_status.get('pending', 0)
+    processing_orders = by_status.get('processing', 0)
+    shipped_orders = by_status.get('shipped', 0)
+    delivered_orders = by_status.get('delivered', 0)
     
     # Revenue metrics
-    total_revenue = Order.objects.aggregate(
-        total=Sum('total_amount')
-    )['total'] or 0
+    total_revenue = totals['revenue']
     
     # Average order value
-    avg_order_value = Order.objects.aggregate(
-        avg=Avg('total_amount')
-    )['avg'] or 0
+    avg_order_value = total_revenue / total_orders if total_orders else 0
     
     # Order trends (last 30 days)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
     daily_orders = []
     daily_revenue = []
     
-    for i in range(30):
-        date = thirty_days_ago + timedelta(days=i)
-        orders_count = Order.objects.filter(created_at__date=date.date()).count()
-        revenue = Order.objects.filter(created_at__date=date.date()).aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
-        
+    for day in daily_series(30):
         daily_orders.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'count': orders_count
+            'date': day['date'].strftime('%Y-%m-%d'),
+            'count': day['orders']
         })
         daily_revenue.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'amount': float(revenue)
+            'date': day['date'].strftime('%Y-%m-%d'),
+            'amount': float(day['revenue'])
         })
     
-    # Order status distribution
-    status_distribution = Order.objects.values('status').annotate(
-        count=Count('id')
-    ).order_by('-count')
-    
     context = {
         'total_orders': total_orders,
         'pending_orders': pending_orders,
@@ -277,6 +285,8 @@ def bulk_operations(request):
             updated = Product.objects.filter(id__in=product_ids).update(is_featured=True)
             messages.success(request, f'{updated} products were marked as featured.')
             
+        bump_catalog_version()
+        purge_tags(*product_listing_tags(Product.objects.filter(id__in=request.POST.getlist('product_ids'))))
         return redirect('admin_bulk_operations')
     
     # Get products for bulk operations
@@ -290,84 +300,64 @@ def bulk_operations(request):
 
 @staff_member_required
 def export_data(request):
-    """Export data functionality."""
-    export_type = request.GET.get('type', 'products')
+    """Export data functionality.
     
-    if export_type == 'products':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="products_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Name', 'SKU', 'Category', 'Price', 'Compare Price', 'Stock', 
-            'Active', 'Featured', 'Created At'
-        ])
-        
-        for product in Product.objects.all():
-            writer.writerow([
-                product.name,
-                product.sku,
-                product.category.name,
-                product.price,
-                product.compare_price or '',
-                product.stock_quantity,
-                product.is_active,
-                product.is_featured,
-                product.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            ])
+    POST queues an export job for `manage.py run_export_worker`; GET lists
+    recent jobs with their progress and download links.
+    """
+    if request.method == 'POST':
+        export_type = request.POST.get('type')
+        if export_type not in EXPORTS:
+            messages.error(request, 'Invalid export type.')
+            return redirect('admin_export_data')
         
-        return response
+        options = export_options(request.POST)
+        job = enqueue_export(export_type, request.user, options['start'], options['end'])
+        messages.success(request, f'{job.get_export_type_display()} export queued.')
+        return redirect('admin_export_data')
     
-    elif export_type == 'orders':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="orders_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Order Number', 'Customer', 'Status', 'Payment Status', 'Total Amount',
-            'Items Count', 'Created At', 'Tracking Number'
-        ])
-        
-        for order in Order.objects.all():
-            writer.writerow([
-                order.order_number,
-                order.user.username if order.user else 'Guest',
-                order.status,
-                order.payment_status,
-                order.total_amount,
-                order.total_items,
-                order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                order.tracking_number or ''
-            ])
-        
-        return response
+    jobs = ExportJob.objects.select_related('requested_by')[:50]
     
-    elif export_type == 'customers':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="customers_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Username', 'Email', 'First Name', 'Last Name', 'Date Joined', 
-            'Last Login', 'Is Active', 'Order Count', 'Total Spent'
-        ])
-        
-        for user in User.objects.annotate(
-            order_count=Count('orders'),
-            total_spent=Sum('orders__total_amount')
-        ):
-            writer.writerow([
-                user.username,
-                user.email,
-                user.first_name,
-                user.last_name,
-                user.date_joined.strftime('%Y-%m-%d %H:%M:%S'),
-                user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else '',
-                user.is_active,
-                user.order_count,
-                user.total_spent or 0
-            ])
-        
-        return response
+    context = {
+        'jobs': jobs,
+        'export_types': ExportJob.EXPORT_TYPES,
+        'selected_type': request.GET.get('type', 'products'),
+        'has_active_jobs': any(job.status in ('queued', 'running') for job in jobs),
+    }
     
-    return JsonResponse({'error': 'Invalid export type'}, status=400)
+    return render(request, 'admin/export_jobs.html', context)
+
+@staff_member_required
+def export_download(request, job_id):
+    """Download the file produced by a finished export job."""
+    job = get_object_or_404(ExportJob, pk=job_id, status='done')
+    return FileResponse(
+        job.file.open('rb'), as_attachment=True, filename=f'{job.export_type}_export_{job.pk}.csv.gz'
+    )
+
+@staff_member_required
+def product_import(request):
+    """Upload a CSV or JSONL file of products, upserted by SKU."""
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Choose a file to import.')
+            return redirect('admin_product_import')
+        
+        result = import_products(
+            upload.file,
+            file_format=guess_format(upload.name),
+            create_categories=bool(request.POST.get('create_categories')),
+        )
+        for error in result.errors:
+            messages.warning(request, error)
+        messages.success(
+            request,
+            f'{result.created} products created, {result.updated} updated, {result.error_count} rows rejected.'
+        )
+        return redirect('admin_product_import')
+    
+    return render(request, 'admin/import_products.html', {
+        'import_fields': IMPORT_FIELDS,
+    })
+
@@ -5,3 +5,6 @@ class StoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "store"
     verbose_name = "STORE"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,41 @@
+from django.db.backends.sqlite3 import base
+
+
+# PRAGMA names accepted in OPTIONS['pragmas'], applied in this order on every new connection
+PRAGMAS = ['journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size']
+
+
+def apply_pragmas(conn, pragmas):
+    """Run the configured PRAGMAs on a raw sqlite3 connection."""
+    for name in PRAGMAS:
+        if name in pragmas:
+            # PRAGMA does not take bound parameters; names are whitelisted and values checked
+            value = str(pragmas[name])
+            if not value.lstrip('-').isalnum():
+                raise ValueError(f'Invalid value {value!r} for PRAGMA {name}')
+            conn.execute(f'PRAGMA {name} = {value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """The stock SQLite backend plus connection tuning.
+
+    OPTIONS['pragmas'] (journal_mode, synchronous, busy_timeout, mmap_size,
+    cache_size) is applied to each new connection. Transactions opened by
+    store.db.write_atomic() begin with BEGIN IMMEDIATE, which takes the
+    write lock up front and waits for it up to busy_timeout.
+    """
+
+    begin_immediate = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE' if self.begin_immediate else 'BEGIN')
@@ -0,0 +1,80 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Category, Product
+
+
+CATALOG_VERSION_KEY = 'store:catalog:version'
+
+
+def _new_version():
+    # Time based, so a lost version key never resurrects old entries
+    return int(time.time() * 1000)
+
+
+def catalog_version():
+    """Current catalog cache version; bumping it invalidates every catalog entry."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, _new_version(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate all cached catalog data."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, _new_version(), None)
+
+
+def cached_catalog(name, builder):
+    """Return the cached value for `name`, building it on a miss."""
+    key = f'store:catalog:{catalog_version()}:{name}'
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, settings.CATALOG_CACHE_TIMEOUT)
+    return value
+
+
+def _build_navigation():
+    categories = list(Category.objects.filter(is_active=True).order_by('path'))
+    product_counts = dict(
+        Product.objects.filter(is_active=True)
+        .values('category').annotate(total=Count('id')).values_list('category', 'total')
+    )
+
+    roots = []
+    for category in categories:
+        if category.parent_id is None:
+            category.child_count = 0
+            category.product_count = 0
+            roots.append(category)
+
+    for root in roots:
+        for category in categories:
+            if category.path.startswith(root.path):
+                root.product_count += product_counts.get(category.pk, 0)
+                if category.parent_id == root.pk:
+                    root.child_count += 1
+
+    roots.sort(key=lambda category: category.name)
+    return roots
+
+
+def navigation_categories():
+    """Active top-level categories with `child_count` and `product_count` (whole subtree)."""
+    return cached_catalog('navigation', _build_navigation)
+
+
+def featured_products():
+    """Featured products for the home page."""
+    return cached_catalog('featured', lambda: list(
+        Product.objects.filter(is_active=True, is_featured=True)
+        .select_related('category', 'primary_image')[:8]
+    ))
@@ -0,0 +1,143 @@
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+
+from .db import conflict_target
+from .models import Cart, CartItem, StockReservation
+
+
+MERGE_BATCH_SIZE = 500
+
+
+def _active_carts(owner):
+    """Active carts keyed by `owner`: 'user' for customers, 'session_key' for guests.
+
+    The same sets the unique_active_cart_per_* constraints cover, so a
+    merge leaves nothing for them to reject.
+    """
+    carts = Cart.objects.filter(is_active=True)
+    if owner == 'user':
+        return carts.filter(user__isnull=False)
+    return carts.filter(user__isnull=True)
+
+
+def _move_holds(losers, keepers):
+    """Re-point the stock holds of merged carts at the kept carts, summed per product.
+
+    `losers` maps merged cart id to kept cart id. The units stay reserved,
+    now for the cart holding the merged items, so Product.reserved_quantity
+    does not change.
+    """
+    held = {}
+    moving = StockReservation.objects.filter(cart_id__in=losers)
+    for cart_id, product_id, quantity, expires_at in moving.values_list(
+        'cart_id', 'product_id', 'quantity', 'expires_at'
+    ):
+        key = (losers[cart_id], product_id)
+        total, latest = held.get(key, (0, expires_at))
+        held[key] = (total + quantity, max(latest, expires_at))
+    if not held:
+        return
+    for cart_id, product_id, quantity, expires_at in StockReservation.objects.filter(
+        cart_id__in=keepers,
+        product_id__in={product_id for _, product_id in held},
+    ).values_list('cart_id', 'product_id', 'quantity', 'expires_at'):
+        if (cart_id, product_id) in held:
+            total, latest = held[cart_id, product_id]
+            held[cart_id, product_id] = (total + quantity, max(latest, expires_at))
+
+    moving.delete()
+    StockReservation.objects.bulk_create(
+        [
+            StockReservation(cart_id=cart_id, product_id=product_id, quantity=quantity, expires_at=expires_at)
+            for (cart_id, product_id), (quantity, expires_at) in held.items()
+        ],
+        update_conflicts=True,
+        update_fields=['quantity', 'expires_at', 'updated_at'],
+        **conflict_target(['cart', 'product']),
+    )
+
+
+def duplicate_groups(owner):
+    """One row per owner with more than one active cart: the owner, the cart
+    count and the cart to keep (the oldest, i.e. lowest id), in one GROUP BY."""
+    return (
+        _active_carts(owner)
+        .values(owner)
+        .annotate(carts=Count('pk'), keeper=Min('pk'))
+        .filter(carts__gt=1)
+        .order_by(owner)
+    )
+
+
+def _merge_batch(owner, keepers):
+    """Fold every other active cart of the given owners into the kept cart.
+
+    `keepers` maps owner to kept cart id. Quantities of the same product are
+    summed with one aggregate query and written with one upsert, their stock
+    holds move along with them, and the merged carts are then deactivated in
+    bulk. Returns the number deactivated.
+    """
+    with transaction.atomic():
+        losers = dict(
+            _active_carts(owner)
+            .filter(**{f'{owner}__in': keepers})
+            .exclude(pk__in=keepers.values())
+            .values_list('pk', owner)
+        )
+        if not losers:
+            return 0
+
+        moved = {}
+        for owner_value, product_id, total in (
+            CartItem.objects.filter(cart_id__in=losers)
+            .values_list(f'cart__{owner}', 'product_id')
+            .annotate(total=Sum('quantity'))
+            .order_by()
+        ):
+            moved[keepers[owner_value], product_id] = total
+        for cart_id, product_id, quantity in CartItem.objects.filter(
+            cart_id__in={cart_id for cart_id, _ in moved},
+            product_id__in={product_id for _, product_id in moved},
+        ).values_list('cart_id', 'product_id', 'quantity'):
+            if (cart_id, product_id) in moved:
+                moved[cart_id, product_id] += quantity
+
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart_id=cart_id, product_id=product_id, quantity=quantity)
+                for (cart_id, product_id), quantity in moved.items()
+            ],
+            update_conflicts=True,
+            update_fields=['quantity', 'updated_at'],
+            **conflict_target(['cart', 'product']),
+        )
+
+        _move_holds({pk: keepers[owner_value] for pk, owner_value in losers.items()}, list(keepers.values()))
+        deactivated = Cart.objects.filter(pk__in=losers).update(is_active=False)
+        Cart.recalculate_totals(Cart.objects.filter(pk__in=keepers.values()))
+    return deactivated
+
+
+def merge_duplicate_carts(owner, batch_size=MERGE_BATCH_SIZE, progress=None):
+    """Leave each owner with a single active cart holding all of their items.
+
+    Duplicate groups are walked by owner in batches of `batch_size`, each in
+    its own short transaction, so the database is never locked for the whole
+    run. `progress(groups, deactivated)` is called with running totals after
+    every batch. Returns (groups, deactivated).
+    """
+    groups_done = deactivated = 0
+    last = None
+    while True:
+        groups = duplicate_groups(owner)
+        if last is not None:
+            groups = groups.filter(**{f'{owner}__gt': last})
+        batch = list(groups[:batch_size])
+        if not batch:
+            return groups_done, deactivated
+
+        deactivated += _merge_batch(owner, {row[owner]: row['keeper'] for row in batch})
+        groups_done += len(batch)
+        last = batch[-1][owner]
+        if progress:
+            progress(groups_done, deactivated)
@@ -0,0 +1,215 @@
+import json
+import secrets
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.utils.module_loading import import_string
+
+from .db import conflict_target, write_atomic
+from .models import Cart, CartItem, Product
+from .reservations import hold_stock
+
+
+GUEST_CART_COOKIE = 'guest_cart'
+GUEST_CART_KEY_PREFIX = 'store:guestcart:'
+MAX_GUEST_CART_LINES = 50
+
+
+def _clean_lines(pairs):
+    """{product_id: quantity} from stored [product_id, quantity] pairs, dropping anything malformed."""
+    lines = {}
+    try:
+        for product_id, quantity in pairs:
+            if isinstance(product_id, int) and isinstance(quantity, int) and quantity > 0:
+                lines[product_id] = quantity
+    except (TypeError, ValueError):
+        return {}
+    return dict(list(lines.items())[:MAX_GUEST_CART_LINES])
+
+
+def _set_cookie(response, value, signed=False):
+    options = {
+        'max_age': settings.GUEST_CART_AGE,
+        'secure': settings.SESSION_COOKIE_SECURE,
+        'httponly': True,
+        'samesite': 'Lax',
+    }
+    if signed:
+        response.set_signed_cookie(GUEST_CART_COOKIE, value, salt=GUEST_CART_COOKIE, **options)
+    else:
+        response.set_cookie(GUEST_CART_COOKIE, value, **options)
+
+
+class SignedCookieGuestCartStorage:
+    """Keep the cart in the visitor's browser as a signed cookie; nothing is stored server side."""
+
+    def load(self, request):
+        value = request.get_signed_cookie(
+            GUEST_CART_COOKIE, default=None, salt=GUEST_CART_COOKIE, max_age=settings.GUEST_CART_AGE
+        )
+        if not value:
+            return {}
+        try:
+            return _clean_lines(json.loads(value))
+        except ValueError:
+            return {}
+
+    def save(self, request, response, lines):
+        _set_cookie(response, json.dumps(list(lines.items()), separators=(',', ':')), signed=True)
+
+    def clear(self, request, response):
+        response.delete_cookie(GUEST_CART_COOKIE, samesite='Lax')
+
+
+class CacheGuestCartStorage:
+    """Keep the cart in the shared cache under a random token held in a cookie."""
+
+    def _key(self, token):
+        return GUEST_CART_KEY_PREFIX + token
+
+    def load(self, request):
+        token = request.COOKIES.get(GUEST_CART_COOKIE)
+        if not token:
+            return {}
+        return _clean_lines(cache.get(self._key(token), []))
+
+    def save(self, request, response, lines):
+        token = request.COOKIES.get(GUEST_CART_COOKIE) or secrets.token_urlsafe(24)
+        cache.set(self._key(token), list(lines.items()), settings.GUEST_CART_AGE)
+        _set_cookie(response, token)
+
+    def clear(self, request, response):
+        token = request.COOKIES.get(GUEST_CART_COOKIE)
+        if token:
+            cache.delete(self._key(token))
+        response.delete_cookie(GUEST_CART_COOKIE, samesite='Lax')
+
+
+@lru_cache(maxsize=None)
+def get_storage():
+    """The backend named by settings.GUEST_CART_STORAGE."""
+    return import_string(settings.GUEST_CART_STORAGE)()
+
+
+class GuestCartItem:
+    """One line of a guest cart; `id` is the product id, which the cart views use to address it."""
+
+    def __init__(self, product, quantity):
+        self.id = product.pk
+        self.product = product
+        self.quantity = quantity
+
+    @property
+    def line_total(self):
+        return self.product.price * self.quantity
+
+
+class GuestCart:
+    """An anonymous visitor's cart, read from and written back to the guest cart storage.
+
+    Offers the parts of Cart the templates and cart views use. It has no
+    database row (`pk` is None) until login folds it into a real Cart.
+    """
+
+    pk = id = None
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.modified = False
+        self._items = None
+
+    @property
+    def items(self):
+        """Lines of active products, loaded with one query."""
+        if self._items is None:
+            products = Product.objects.filter(pk__in=self.lines, is_active=True).select_related(
+                'category', 'primary_image'
+            ).in_bulk()
+            self._items = [
+                GuestCartItem(products[product_id], quantity)
+                for product_id, quantity in self.lines.items() if product_id in products
+            ]
+        return self._items
+
+    @property
+    def total_items(self):
+        return sum(self.lines.values())
+
+    @property
+    def total_price(self):
+        return sum((item.line_total for item in self.items), Decimal('0.00'))
+
+    def refresh_from_db(self, fields=None):
+        """Totals are computed from the lines, so there is nothing to reload."""
+
+    def quantity_of(self, product_id):
+        return self.lines.get(product_id, 0)
+
+    def set_quantity(self, product, quantity):
+        """Set the quantity of `product`, removing it at zero.
+
+        Raises ValidationError if the stock cannot cover it or the cart is
+        full. Nothing is held until the cart is materialized at login.
+        """
+        if quantity <= 0:
+            self.lines.pop(product.pk, None)
+        else:
+            if product.pk not in self.lines and len(self.lines) >= MAX_GUEST_CART_LINES:
+                raise ValidationError('Your cart is full. Please log in to add more products.')
+            if product.track_inventory and not product.allow_backorder and quantity > product.available_quantity:
+                raise ValidationError(f'Only {product.available_quantity} of {product.name} available.')
+            self.lines[product.pk] = quantity
+        self.modified = True
+        self._items = None
+
+
+def load_guest_cart(request):
+    return GuestCart(get_storage().load(request))
+
+
+def save_guest_cart(request, response):
+    """Write a guest cart changed during this request back to its storage."""
+    cart = getattr(request, '_cached_cart', None)
+    if isinstance(cart, GuestCart) and cart.modified:
+        if cart.lines:
+            get_storage().save(request, response, cart.lines)
+        else:
+            get_storage().clear(request, response)
+
+
+def materialize_guest_cart(user, lines):
+    """Fold guest cart lines into the user's active cart and return it.
+
+    The lines are merged with one upsert, adding to quantities already in
+    the cart, then held like any other cart item. A line whose stock has
+    run out stays in the cart without a hold; checkout checks stock again.
+    """
+    products = Product.objects.filter(pk__in=lines, is_active=True).in_bulk()
+    lines = {product_id: quantity for product_id, quantity in lines.items() if product_id in products}
+    if not lines:
+        return None
+
+    with write_atomic():
+        cart = Cart.get_or_create_cart(user)
+        quantities = dict(lines)
+        for product_id, quantity in cart.items.filter(product_id__in=lines).values_list('product_id', 'quantity'):
+            quantities[product_id] += quantity
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                for product_id, quantity in quantities.items()
+            ],
+            update_conflicts=True,
+            update_fields=['quantity', 'updated_at'],
+            **conflict_target(['cart', 'product']),
+        )
+        cart.update_totals()
+        for product_id, quantity in quantities.items():
+            try:
+                hold_stock(cart, products[product_id], quantity)
+            except ValidationError:
+                pass
+    return cart
@@ -3,11 +3,19 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from django.core.exceptions import ValidationError
+from django.db.models import Count
 from django.utils import timezone
 from decimal import Decimal
 
-from .models import Cart, CartItem, Order, OrderItem, Address, Coupon, Wishlist
+from .models import CartItem, Order, Address, Coupon, Product, Wishlist
 from .forms import AddToCartForm, CheckoutForm, CouponForm
+from .cart_storage import GuestCart
+from .checkout import place_order
+from .db import write_atomic
+from .middleware import get_cart, get_or_create_cart
+from .reservations import hold_stock
+from .pagination import paginate_keyset
 
 
 @require_POST
@@ -21,34 +29,33 @@ def add_to_cart(request, product_id):
     if form.is_valid():
         quantity = form.cleaned_data['quantity']
         
-        # Get or create cart
-        if request.user.is_authenticated:
-            # First try to get existing active cart
-            cart = Cart.objects.filter(user=request.user, is_active=True).first()
-            if not cart:
-                # If no active cart exists, create a new one
-                cart = Cart.objects.create(user=request.user, is_active=True)
-        else:
-            session_key = request.session.session_key
-            if not session_key:
-                request.session.create()
-                session_key = request.session.session_key
-            # First try to get existing active cart
-            cart = Cart.objects.filter(session_key=session_key, is_active=True).first()
-            if not cart:
-                # If no active cart exists, create a new one
-                cart = Cart.objects.create(session_key=session_key, is_active=True)
+        cart = get_or_create_cart(request)
         
-        # Add or update cart item
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        # Add or update cart item; stock holds and cart totals change in the same transaction
+        try:
+            if isinstance(cart, GuestCart):
+                cart.set_quantity(product, cart.quantity_of(product.pk) + quantity)
+            else:
+                with write_atomic():
+                    cart_item, created = CartItem.objects.get_or_create(
+                        cart=cart,
+                        product=product,
+                        defaults={'quantity': quantity}
+                    )
+                    
+                    if not created:
+                        cart_item.quantity += quantity
+                        cart_item.save()
+                    hold_stock(cart, product, cart_item.quantity)
+        except ValidationError as e:
+            if request.headers.get('Content-Type') == 'application/json':
+                return JsonResponse({
+                    'success': False,
+                    'message': e.messages[0]
+                })
+            messages.error(request, e.messages[0])
+            return redirect('store:product_detail', slug=product.slug)
+        cart.refresh_from_db(fields=['item_count', 'subtotal'])
         
         messages.success(request, f'{product.name} added to cart!')
         
@@ -72,30 +79,54 @@ def add_to_cart(request, product_id):
             return redirect('store:product_detail', slug=product.slug)
 
 
+def _update_guest_line(cart, product_id, quantity):
+    """update_cart_item and remove_from_cart for a guest cart, whose item ids are product ids."""
+    if product_id not in cart.lines:
+        return JsonResponse({'success': False, 'message': 'Unauthorized'})
+    product = get_object_or_404(Product, id=product_id)
+    
+    try:
+        cart.set_quantity(product, quantity)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'message': e.messages[0]})
+    
+    return JsonResponse({
+        'success': True,
+        'message': 'Cart updated' if quantity > 0 else f'{product.name} removed from cart',
+        'cart_items': cart.total_items,
+        'cart_total': str(cart.total_price),
+        'item_total': str(product.price * max(quantity, 0))
+    })
+
+
 @require_POST
 def update_cart_item(request, item_id):
     """Update cart item quantity."""
-    cart_item = get_object_or_404(CartItem, id=item_id)
+    cart = get_cart(request)
+    if isinstance(cart, GuestCart):
+        return _update_guest_line(cart, item_id, int(request.POST.get('quantity', 1)))
     
-    # Check if user owns this cart item
-    if request.user.is_authenticated:
-        if cart_item.cart.user != request.user:
-            return JsonResponse({'success': False, 'message': 'Unauthorized'})
-    else:
-        if cart_item.cart.session_key != request.session.session_key:
-            return JsonResponse({'success': False, 'message': 'Unauthorized'})
+    cart_item = get_object_or_404(CartItem.objects.select_related('product'), id=item_id)
     
-    quantity = int(request.POST.get('quantity', 1))
+    # Check if the item belongs to this request's cart
+    if cart is None or cart_item.cart_id != cart.id:
+        return JsonResponse({'success': False, 'message': 'Unauthorized'})
     
-    if quantity <= 0:
-        cart_item.delete()
-        message = 'Item removed from cart'
-    else:
-        cart_item.quantity = quantity
-        cart_item.save()
-        message = 'Cart updated'
+    quantity = int(request.POST.get('quantity', 1))
     
-    cart = cart_item.cart
+    try:
+        with write_atomic():
+            hold_stock(cart, cart_item.product, quantity)
+            if quantity <= 0:
+                cart_item.delete()
+                message = 'Item removed from cart'
+            else:
+                cart_item.quantity = quantity
+                cart_item.save()
+                message = 'Cart updated'
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'message': e.messages[0]})
+    cart.refresh_from_db(fields=['item_count', 'subtotal'])
     
     return JsonResponse({
         'success': True,
@@ -109,20 +140,21 @@ def update_cart_item(request, item_id):
 @require_POST
 def remove_from_cart(request, item_id):
     """Remove item from cart."""
-    cart_item = get_object_or_404(CartItem, id=item_id)
+    cart = get_cart(request)
+    if isinstance(cart, GuestCart):
+        return _update_guest_line(cart, item_id, 0)
     
-    # Check if user owns this cart item
-    if request.user.is_authenticated:
-        if cart_item.cart.user != request.user:
-            return JsonResponse({'success': False, 'message': 'Unauthorized'})
-    else:
-        if cart_item.cart.session_key != request.session.session_key:
-            return JsonResponse({'success': False, 'message': 'Unauthorized'})
+    cart_item = get_object_or_404(CartItem.objects.select_related('product'), id=item_id)
     
-    product_name = cart_item.product.name
-    cart_item.delete()
+    # Check if the item belongs to this request's cart
+    if cart is None or cart_item.cart_id != cart.id:
+        return JsonResponse({'success': False, 'message': 'Unauthorized'})
     
-    cart = cart_item.cart
+    product_name = cart_item.product.name
+    with write_atomic():
+        hold_stock(cart, cart_item.product, 0)
+        cart_item.delete()
+    cart.refresh_from_db(fields=['item_count', 'subtotal'])
     
     return JsonResponse({
         'success': True,
@@ -135,29 +167,13 @@ def remove_from_cart(request, item_id):
 @login_required
 def checkout(request):
     """Checkout page."""
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    # Clean up any duplicate active carts first
-    active_carts = Cart.objects.filter(user=request.user, is_active=True)
-    cart_count = active_carts.count()
-    
-    if cart_count > 1:
-        logger.warning(f'User {request.user.username} has {cart_count} active carts, cleaning up...')
-        # Keep the most recent cart and deactivate others
-        latest_cart = active_carts.order_by('-created_at').first()
-        deactivated_count = active_carts.exclude(id=latest_cart.id).update(is_active=False)
-        logger.info(f'Deactivated {deactivated_count} duplicate carts for user {request.user.username}')
-        cart = latest_cart
-    else:
-        # Get the single active cart
-        cart = active_carts.first()
+    cart = get_cart(request)
     
     if not cart:
         messages.warning(request, 'Your cart is empty!')
         return redirect('store:cart')
     
-    cart_items = cart.items.select_related('product').all()
+    cart_items = cart.items.select_related('product__primary_image')
     
     if not cart_items.exists():
         messages.warning(request, 'Your cart is empty!')
@@ -169,30 +185,18 @@ def checkout(request):
     if request.method == 'POST':
         form = CheckoutForm(request.POST, user=request.user)
         if form.is_valid():
-            # Create order
-            order = form.save(commit=False)
-            order.user = request.user
-            order.subtotal = cart.total_price
-            order.total_amount = cart.total_price  # Add tax, shipping, discount logic
-            order.save()
-            
-            # Create order items
-            for cart_item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    quantity=cart_item.quantity,
-                    price=cart_item.product.price,
-                    product_name=cart_item.product.name,
-                    product_sku=cart_item.product.sku
+            try:
+                order = place_order(
+                    request.user,
+                    cart,
+                    shipping_address=form.cleaned_data['shipping_address'],
+                    billing_address=form.cleaned_data['billing_address'],
+                    notes=form.cleaned_data['notes'],
                 )
-                
-                # Reduce stock
-                cart_item.product.reduce_stock(cart_item.quantity)
-            
-            # Deactivate cart
-            cart.is_active = False
-            cart.save()
+            except ValidationError as e:
+                for error in e.messages:
+                    messages.error(request, error)
+                return redirect('store:cart')
             
             messages.success(request, f'Order {order.order_number} created successfully!')
             return redirect('store:order_detail', order_number=order.order_number)
@@ -211,7 +215,8 @@ def checkout(request):
 @login_required
 def order_list(request):
     """User's order history."""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    orders = Order.objects.filter(user=request.user).annotate(item_count=Count('items'))
+    orders = paginate_keyset(orders, ['-created_at', '-id'], request.GET.get('cursor'), per_page=10)
     
     context = {
         'orders': orders,
@@ -223,7 +228,7 @@ def order_list(request):
 def order_detail(request, order_number):
     """Order detail page."""
     order = get_object_or_404(Order, order_number=order_number, user=request.user)
-    order_items = order.items.select_related('product').all()
+    order_items = order.items.select_related('product__primary_image')
     
     context = {
         'order': order,
@@ -242,24 +247,7 @@ def apply_coupon(request):
         try:
             coupon = Coupon.objects.get(code=code, is_active=True)
             
-            # Get cart (handle multiple carts)
-            if request.user.is_authenticated:
-                active_carts = Cart.objects.filter(user=request.user, is_active=True)
-                if active_carts.count() > 1:
-                    # Keep the most recent cart and deactivate others
-                    cart = active_carts.order_by('-created_at').first()
-                    active_carts.exclude(id=cart.id).update(is_active=False)
-                else:
-                    cart = active_carts.first()
-            else:
-                session_key = request.session.session_key
-                active_carts = Cart.objects.filter(session_key=session_key, is_active=True)
-                if active_carts.count() > 1:
-                    # Keep the most recent cart and deactivate others
-                    cart = active_carts.order_by('-created_at').first()
-                    active_carts.exclude(id=cart.id).update(is_active=False)
-                else:
-                    cart = active_carts.first()
+            cart = get_cart(request)
             
             if not cart:
                 messages.error(request, 'No active cart found.')
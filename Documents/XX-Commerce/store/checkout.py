@@ -0,0 +1,117 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .db import write_atomic
+from .models import Cart, Order, OrderItem, Product, StockReservation
+from .page_cache import purge_products
+from .rollups import record_items
+
+
+def _stock_shortfalls(lines, products, held):
+    """Messages for cart lines that the locked stock levels cannot cover.
+
+    Units this cart already holds count as available to it.
+    """
+    errors = []
+    for product_id, quantity in lines:
+        product = products.get(product_id)
+        if product is None or not product.is_active:
+            errors.append('A product in your cart is no longer available.')
+            continue
+        free = product.available_quantity + held.get(product_id, 0)
+        if product.track_inventory and not product.allow_backorder and free < quantity:
+            errors.append(f'Only {free} of {product.name} left in stock.')
+    return errors
+
+
+def _decrement_stock(lines, products, held):
+    """Take the ordered quantities off stock, and the cart's holds off the
+    reserved counters, in one guarded UPDATE.
+
+    Rows without enough unreserved stock (and no backorder) are left out by
+    the WHERE clause, so a short row count means another checkout got there
+    first.
+    """
+    tracked = {
+        product_id: quantity for product_id, quantity in lines
+        if products[product_id].track_inventory
+    }
+    if not tracked:
+        return
+
+    needed = Case(*(When(pk=pk, then=Value(quantity)) for pk, quantity in tracked.items()))
+    released = Case(
+        *(When(pk=pk, then=Value(quantity)) for pk, quantity in held.items()),
+        default=Value(0),
+    )
+    updated = Product.objects.filter(
+        Q(allow_backorder=True) | Q(stock_quantity__gte=F('reserved_quantity') - released + needed),
+        pk__in=tracked,
+    ).update(
+        stock_quantity=Greatest(F('stock_quantity') - needed, Value(0)),
+        reserved_quantity=Greatest(F('reserved_quantity') - released, Value(0)),
+    )
+
+    if updated != len(tracked):
+        raise ValidationError('Some items in your cart just sold out. Please review your cart.')
+
+
+def place_order(user, cart, shipping_address, billing_address, notes=''):
+    """Turn an active cart into an order, atomically.
+
+    Products are locked in primary key order (so concurrent checkouts cannot
+    deadlock), stock is decremented with F() expressions, the cart's stock
+    holds are turned into the sale, order items are bulk inserted and the
+    cart is closed. The number of queries does not depend on the number of
+    cart lines. Raises ValidationError, with nothing written, if the cart is
+    empty or stock has run out.
+    """
+    with write_atomic():
+        lines = list(cart.items.order_by('product_id').values_list('product_id', 'quantity'))
+        if not lines:
+            raise ValidationError('Your cart is empty!')
+
+        products = Product.objects.select_for_update().filter(
+            pk__in=[product_id for product_id, _ in lines]
+        ).order_by('pk').in_bulk()
+
+        held = dict(cart.reservations.values_list('product_id', 'quantity'))
+        errors = _stock_shortfalls(lines, products, held)
+        if errors:
+            raise ValidationError(errors)
+
+        _decrement_stock(lines, products, held)
+
+        subtotal = sum(products[product_id].price * quantity for product_id, quantity in lines)
+        order = Order.objects.create(
+            user=user,
+            subtotal=subtotal,
+            total_amount=subtotal,  # Add tax, shipping, discount logic
+            shipping_address=shipping_address,
+            billing_address=billing_address,
+            notes=notes,
+        )
+
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product_id=product_id,
+                quantity=quantity,
+                price=products[product_id].price,
+                product_name=products[product_id].name,
+                product_sku=products[product_id].sku,
+            )
+            for product_id, quantity in lines
+        ])
+        # bulk_create skips the post_save signals that count items into the rollups
+        record_items(order.pk, sum(quantity for _, quantity in lines))
+
+        Cart.objects.filter(pk=cart.pk).update(is_active=False)
+        StockReservation.objects.filter(cart=cart).delete()
+
+        # Queryset updates skip the post_save signals that purge cached pages
+        transaction.on_commit(lambda: purge_products(products))
+
+    return order
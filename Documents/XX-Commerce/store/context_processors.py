@@ -1,48 +1,42 @@
-from .models import Cart, Category
+from django.utils.functional import SimpleLazyObject
+
+from .cache import navigation_categories
+from .middleware import get_cart
+from .page_cache import is_page_cache_render
 
 
 def cart(request):
-    """Add cart information to template context."""
-    cart = None
-    cart_items = 0
-    cart_total = 0
-    
-    if request.user.is_authenticated:
-        try:
-            cart = Cart.objects.filter(user=request.user, is_active=True).first()
-            if cart:
-                cart_items = cart.total_items
-                cart_total = cart.total_price
-        except Exception:
-            pass
-    else:
-        session_key = request.session.session_key
-        if session_key:
-            try:
-                cart = Cart.objects.filter(session_key=session_key, is_active=True).first()
-                if cart:
-                    cart_items = cart.total_items
-                    cart_total = cart.total_price
-            except Exception:
-                pass
-    
+    """Add cart information to template context.
+
+    Values are callables so the cart is only resolved when a template
+    actually renders them. Pages rendered for the shared page cache get
+    an empty cart; the browser fills in the real one.
+    """
+    if is_page_cache_render(request):
+        return {
+            'cart': None,
+            'cart_items': 0,
+            'cart_total': 0,
+            'page_cache_render': True,
+        }
+
+    def cart_items():
+        cart = get_cart(request)
+        return cart.total_items if cart else 0
+
+    def cart_total():
+        cart = get_cart(request)
+        return cart.total_price if cart else 0
+
     return {
-        'cart': cart,
+        'cart': SimpleLazyObject(lambda: get_cart(request)),
         'cart_items': cart_items,
         'cart_total': cart_total,
     }
 
 
 def categories(request):
-    """Add categories to template context."""
-    try:
-        categories = Category.objects.filter(
-            is_active=True, 
-            parent__isnull=True
-        )[:6]
-    except Exception as e:
-        categories = []
-    
+    """Add cached navigation categories to template context."""
     return {
-        'categories': categories,
+        'categories': SimpleLazyObject(lambda: navigation_categories()[:6]),
     }
@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+
+from django.db import connections, transaction
+
+
+@contextmanager
+def write_atomic(using=None):
+    """transaction.atomic() for blocks that read and then write.
+
+    On the store.backends.sqlite3 engine the outermost block starts with
+    BEGIN IMMEDIATE. A plain deferred transaction that reads first fails at
+    once with "database is locked" when it tries to write after another
+    connection has, since waiting cannot help it; an immediate one queues
+    for the write lock instead. On other backends this is plain atomic().
+    """
+    connection = transaction.get_connection(using)
+    connection.begin_immediate = not connection.in_atomic_block
+    try:
+        with transaction.atomic(using=using):
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
+
+
+def conflict_target(fields, using='default'):
+    """The unique_fields argument for bulk_create(update_conflicts=True).
+
+    PostgreSQL and SQLite need the conflict target named; MySQL and MariaDB
+    upsert on whichever unique key clashes and reject unique_fields, so on
+    those this is empty.
+    """
+    if connections[using].features.supports_update_conflicts_with_target:
+        return {'unique_fields': fields}
+    return {}
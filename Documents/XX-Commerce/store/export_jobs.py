@@ -0,0 +1,115 @@
+import gzip
+import logging
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .exports import EXPORTS, csv_batches
+from .models import ExportJob
+from .routers import REPLICA, replica_configured, replica_reads
+
+
+logger = logging.getLogger(__name__)
+
+
+class _ClaimLost(Exception):
+    """The job was handed to another worker while this one was running it."""
+
+
+def enqueue_export(export_type, user=None, start=None, end=None):
+    """Queue an export for the worker and return the job."""
+    return ExportJob.objects.create(
+        export_type=export_type,
+        requested_by=user,
+        start_date=start,
+        end_date=end,
+    )
+
+
+def claim_next_job():
+    """Take the oldest waiting job, or return None if there is nothing to do.
+
+    Claiming is a conditional UPDATE on (status, updated_at), so two workers
+    can never run the same job, on any database. Running jobs whose worker
+    stopped reporting progress for EXPORT_JOB_STALE_AFTER seconds are
+    picked up again; the new `started_at` marks the claim, so the worker that
+    lost it can tell (see run_job).
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.EXPORT_JOB_STALE_AFTER)
+    candidates = ExportJob.objects.filter(
+        Q(status='queued') | Q(status='running', updated_at__lt=stale)
+    ).order_by('created_at').values_list('pk', 'status', 'updated_at')[:10]
+
+    for pk, status, updated_at in candidates:
+        claimed = ExportJob.objects.filter(pk=pk, status=status, updated_at=updated_at).update(
+            status='running',
+            processed_rows=0,
+            error='',
+            started_at=now,
+            updated_at=now,
+        )
+        if claimed:
+            return ExportJob.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    """Write the job's export to a gzipped CSV in EXPORT_ROOT, reporting progress.
+
+    Every update is conditional on the claim (`started_at`) this worker made.
+    If a stale job was handed to another worker meanwhile, the update touches
+    no rows and this run stops and drops its output, leaving the job to its
+    new owner.
+    """
+    export = EXPORTS[job.export_type]
+    rows = export.rows(start=job.start_date, end=job.end_date)
+    jobs = ExportJob.objects.filter(pk=job.pk, status='running', started_at=job.started_at)
+    if replica_configured():
+        # refresh_replica swaps in a new file; a connection kept from an
+        # earlier job would go on reading the old one
+        connections[REPLICA].close()
+
+    try:
+        # The export's rows come from the read replica, progress goes to the primary
+        with replica_reads():
+            if not jobs.update(total_rows=rows.count(), updated_at=timezone.now()):
+                raise _ClaimLost
+        processed = 0
+        with replica_reads(), tempfile.TemporaryFile() as tmp:
+            with gzip.GzipFile(fileobj=tmp, mode='wb') as compressed:
+                for text, count in csv_batches(export, rows):
+                    compressed.write(text.encode('utf-8'))
+                    processed += count
+                    # Doubles as the heartbeat that keeps the job from looking stale
+                    if not jobs.update(processed_rows=processed, updated_at=timezone.now()):
+                        raise _ClaimLost
+            tmp.seek(0)
+            # An unguessable name, in case EXPORT_ROOT is ever exposed
+            job.file.save(f'{job.export_type}_export_{uuid.uuid4().hex}.csv.gz', File(tmp), save=False)
+    except _ClaimLost:
+        logger.warning('Export job %s was taken over by another worker; dropping this run', job.pk)
+        return False
+    except Exception as e:
+        logger.exception('Export job %s failed', job.pk)
+        jobs.update(status='failed', error=str(e), finished_at=timezone.now(), updated_at=timezone.now())
+        return False
+
+    finished = jobs.update(
+        status='done',
+        file=job.file.name,
+        processed_rows=processed,
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    if not finished:
+        logger.warning('Export job %s was taken over by another worker; dropping this run', job.pk)
+        job.file.delete(save=False)
+        return False
+    return True
@@ -0,0 +1,200 @@
+import csv
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Order, OrderItem, Product, User
+
+
+CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _datetime(value):
+    return value.strftime(DATETIME_FORMAT) if value else ''
+
+
+class Export:
+    """A CSV export: a header plus one values_list() row per record.
+
+    Subclasses name the columns to fetch so that joins and aggregates run in
+    SQL and rows stream straight from the cursor without model instances.
+    """
+    name = ''
+    header = []
+    fields = []
+    date_field = 'created_at'
+
+    def base_queryset(self):
+        raise NotImplementedError
+
+    def annotate(self, queryset):
+        return queryset
+
+    def format(self, row):
+        return row
+
+    def rows(self, queryset=None, start=None, end=None):
+        """values_list() rows of `queryset` (default: everything), optionally
+        limited to records whose date_field falls within [start, end]."""
+        if queryset is None:
+            queryset = self.base_queryset()
+        if start:
+            queryset = queryset.filter(**{
+                f'{self.date_field}__gte': timezone.make_aware(datetime.combine(start, time.min))
+            })
+        if end:
+            queryset = queryset.filter(**{
+                f'{self.date_field}__lt': timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+            })
+        return self.annotate(queryset).order_by('pk').values_list(*self.fields)
+
+
+class ProductExport(Export):
+    name = 'products'
+    header = [
+        'Name', 'SKU', 'Category', 'Price', 'Compare Price', 'Stock',
+        'Active', 'Featured', 'Created At'
+    ]
+    fields = [
+        'name', 'sku', 'category__name', 'price', 'compare_price', 'stock_quantity',
+        'is_active', 'is_featured', 'created_at'
+    ]
+
+    def base_queryset(self):
+        return Product.objects.all()
+
+    def format(self, row):
+        name, sku, category, price, compare_price, stock, active, featured, created_at = row
+        return [name, sku, category, price, compare_price or '', stock, active, featured, _datetime(created_at)]
+
+
+class OrderExport(Export):
+    name = 'orders'
+    header = [
+        'Order Number', 'Customer', 'Status', 'Payment Status', 'Total Amount',
+        'Items Count', 'Created At', 'Tracking Number'
+    ]
+    fields = [
+        'order_number', 'user__username', 'status', 'payment_status', 'total_amount',
+        'items_count', 'created_at', 'tracking_number'
+    ]
+
+    def base_queryset(self):
+        return Order.objects.all()
+
+    def annotate(self, queryset):
+        # A correlated subquery, so the item join cannot multiply order rows
+        items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        return queryset.annotate(items_count=Coalesce(
+            Subquery(items.annotate(total=Sum('quantity')).values('total'), output_field=IntegerField()),
+            Value(0),
+        ))
+
+    def format(self, row):
+        number, username, status, payment_status, total, items, created_at, tracking = row
+        return [number, username or 'Guest', status, payment_status, total, items, _datetime(created_at), tracking or '']
+
+
+class CustomerExport(Export):
+    name = 'customers'
+    header = [
+        'Username', 'Email', 'First Name', 'Last Name', 'Date Joined',
+        'Last Login', 'Is Active', 'Order Count', 'Total Spent'
+    ]
+    fields = [
+        'username', 'email', 'first_name', 'last_name', 'date_joined',
+        'last_login', 'is_active', 'customer_stats__order_count', 'customer_stats__total_spent'
+    ]
+    date_field = 'date_joined'
+
+    def base_queryset(self):
+        return User.objects.all()
+
+    def format(self, row):
+        username, email, first_name, last_name, joined, last_login, active, orders, spent = row
+        return [username, email, first_name, last_name, _datetime(joined), _datetime(last_login), active, orders or 0, spent or 0]
+
+
+EXPORTS = {export.name: export for export in (ProductExport(), OrderExport(), CustomerExport())}
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def csv_batches(export, rows):
+    """Yield (text, row_count) pairs covering the CSV, ROWS_PER_WRITE rows at a time.
+
+    The first batch starts with the header line.
+    """
+    writer = csv.writer(_Echo())
+    buffer = [writer.writerow(export.header)]
+    count = 0
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        buffer.append(writer.writerow(export.format(row)))
+        count += 1
+        if count >= ROWS_PER_WRITE:
+            yield ''.join(buffer), count
+            buffer = []
+            count = 0
+    if buffer:
+        yield ''.join(buffer), count
+
+
+def _csv_chunks(export, rows):
+    for text, _ in csv_batches(export, rows):
+        yield text
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(export, queryset=None, start=None, end=None, compress=False):
+    """Return a StreamingHttpResponse with the export as CSV (or gzipped CSV).
+
+    Memory use is bounded by CHUNK_SIZE rows however large the table is.
+    """
+    chunks = _csv_chunks(export, export.rows(queryset, start, end))
+    filename = f'{export.name}_export.csv'
+    content_type = 'text/csv'
+    if compress:
+        chunks = _gzip_chunks(chunks)
+        filename += '.gz'
+        content_type = 'application/gzip'
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _parse_day(value):
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def export_options(params):
+    """Read `start`, `end` (YYYY-MM-DD, ignored if invalid) and `gzip` from a QueryDict."""
+    return {
+        'start': _parse_day(params.get('start')),
+        'end': _parse_day(params.get('end')),
+        'compress': params.get('gzip') in ('1', 'true', 'on'),
+    }
@@ -0,0 +1,359 @@
+import csv
+import io
+import json
+from operator import itemgetter
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import search
+from .cache import bump_catalog_version
+from .db import conflict_target, write_atomic
+from .models import Cart, CartItem, Category, Product
+from .page_cache import purge_tags
+
+
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 50
+
+# Columns an import file may carry; `sku` is the upsert key
+TEXT_FIELDS = ['name', 'description', 'short_description', 'dimensions', 'meta_title', 'meta_description']
+DECIMAL_FIELDS = ['price', 'compare_price', 'weight']
+INTEGER_FIELDS = ['stock_quantity']
+BOOLEAN_FIELDS = ['is_active', 'is_featured', 'track_inventory', 'allow_backorder']
+IMPORT_FIELDS = ['sku', 'category'] + TEXT_FIELDS + DECIMAL_FIELDS + INTEGER_FIELDS + BOOLEAN_FIELDS
+
+# Needed to insert a new product; updates may leave them out
+REQUIRED_FOR_NEW = ['name', 'category', 'price']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'off'}
+
+
+def _is_blank(key, value):
+    if value is None:
+        return True
+    # An empty text cell clears the field; an empty number, flag or category leaves it as it is
+    return key not in TEXT_FIELDS and key != 'sku' and str(value).strip() == ''
+
+
+def _present(record):
+    """The record without keys that carry no value: JSON nulls, cells missing
+    from a short CSV row, and blank cells other than text."""
+    return {key: value for key, value in record.items() if key is not None and not _is_blank(key, value)}
+
+
+def read_records(fileobj, file_format):
+    """Yield (line_number, record) pairs from a binary CSV or JSON Lines file, one at a time.
+
+    A JSON line that does not hold an object is yielded as None.
+    """
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, _present(record)
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_number, _present(record) if isinstance(record, dict) else None
+    else:
+        raise ValueError(f'Unsupported import format "{file_format}".')
+
+
+def guess_format(filename):
+    """'jsonl' for .jsonl/.ndjson files, otherwise 'csv'."""
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+class CategoryMap:
+    """Category ids by lower-cased name and by slug, plus their paths, loaded once per import."""
+
+    def __init__(self, create_missing=False):
+        self.create_missing = create_missing
+        self.by_key = {}
+        self.paths = {}
+        self.slugs = set()
+        for pk, name, slug, path in Category.objects.values_list('pk', 'name', 'slug', 'path'):
+            self.by_key[name.lower()] = pk
+            self.by_key[slug] = pk
+            self.paths[pk] = path
+            self.slugs.add(slug)
+
+    def listing_tags(self, category_ids):
+        """Page cache tags of the listings for the given categories and their ancestors."""
+        return {
+            f'category:{pk}'
+            for category_id in category_ids
+            for pk in self.paths.get(category_id, '').split('/') if pk
+        }
+
+    def resolve(self, value):
+        key = value.strip()
+        pk = self.by_key.get(key.lower()) or self.by_key.get(key)
+        if pk or not key:
+            return pk
+        if not self.create_missing:
+            return None
+        category = Category.objects.create(name=key, slug=_unique_slug(slugify(key)[:90] or 'category', self.slugs))
+        self.by_key[key.lower()] = self.by_key[category.slug] = category.pk
+        self.paths[category.pk] = category.path
+        return category.pk
+
+
+def _unique_slug(base, taken):
+    """`base`, or `base-N` with the lowest N not in `taken`; the result is added to `taken`."""
+    slug, counter = base, 1
+    while slug in taken:
+        slug = f'{base}-{counter}'
+        counter += 1
+    taken.add(slug)
+    return slug
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f'"{value}" is not a yes/no value')
+
+
+def _parse_decimal(value, field):
+    if value is None or str(value).strip() == '':
+        if field == 'price':
+            raise ValueError('price is required')
+        return None
+    try:
+        number = Decimal(str(value).strip()).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'{field} "{value}" is not a number')
+    if number < 0 or (field == 'price' and number <= 0):
+        raise ValueError(f'{field} must be positive')
+    return number
+
+
+def _parse_record(record, columns, categories):
+    """Model field values for one import record; raises ValueError if it is unusable."""
+    values = {'sku': str(record.get('sku') or '').strip()}
+    if not values['sku']:
+        raise ValueError('sku is required')
+    for field in columns:
+        value = record.get(field)
+        if field == 'category':
+            values['category_id'] = categories.resolve(str(value))
+            if values['category_id'] is None:
+                raise ValueError(f'unknown category "{value}"')
+        elif field in TEXT_FIELDS:
+            values[field] = str(value).strip()
+        elif field in DECIMAL_FIELDS:
+            values[field] = _parse_decimal(value, field)
+        elif field in INTEGER_FIELDS:
+            try:
+                values[field] = max(int(value), 0)
+            except (TypeError, ValueError):
+                raise ValueError(f'{field} "{value}" is not a whole number')
+        elif field in BOOLEAN_FIELDS:
+            values[field] = _parse_bool(value)
+    if 'name' in values and not values['name']:
+        raise ValueError('name is required')
+    return values
+
+
+def _assign_slugs(new_rows):
+    """Give every new product a unique slug with two lookups for the whole chunk.
+
+    Names are slugified; a name whose slug is taken gets its SKU appended,
+    which is unique already, and only a clash on that falls back to a counter.
+    """
+    bases = {values['sku']: slugify(values['name'])[:150] or 'product' for values in new_rows}
+    taken = set(Product.objects.filter(slug__in=set(bases.values())).values_list('slug', flat=True))
+
+    slugs, seen = {}, set()
+    for sku, base in bases.items():
+        if base in taken or base in seen:
+            slugs[sku] = f'{base}-{slugify(sku)[:45]}'
+        else:
+            slugs[sku] = base
+        seen.add(slugs[sku])
+
+    fallbacks = {slug for sku, slug in slugs.items() if slug != bases[sku]}
+    taken.update(Product.objects.filter(slug__in=fallbacks).values_list('slug', flat=True))
+    for values in new_rows:
+        values['slug'] = _unique_slug(slugs[values['sku']], taken)
+
+
+def _upsert_sqlite(rows, update_fields):
+    """INSERT ... ON CONFLICT (sku) DO UPDATE through executemany().
+
+    The same statement bulk_create(update_conflicts=True) issues, minus
+    building a model instance and preparing every value through the ORM,
+    which is most of the cost on SQLite (whose 999 parameter limit also cuts
+    bulk_create into ~50 row batches).
+    """
+    fields = [field for field in Product._meta.concrete_fields if not field.primary_key]
+    defaults = {field.attname: field.get_default() for field in fields}
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    defaults['created_at'] = defaults['updated_at'] = now
+
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    updates = ', '.join(
+        f'{quote(column)} = EXCLUDED.{quote(column)}'
+        for column in (Product._meta.get_field(name).column for name in update_fields)
+    )
+    sql = (
+        f'INSERT INTO {quote(Product._meta.db_table)} ({columns}) VALUES ({placeholders}) '
+        f'ON CONFLICT ({quote("sku")}) DO UPDATE SET {updates}'
+    )
+    row_values = itemgetter(*(field.attname for field in fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [row_values({**defaults, **values}) for values in rows])
+
+
+class ProductImporter:
+    """Upsert products by SKU from a stream of records, IMPORT_CHUNK_SIZE at a time.
+
+    Each record writes only the fields it carries; records are chunked by
+    that set of fields. Each chunk is validated in Python, then written with
+    a single bulk_create(update_conflicts=True) inside its own transaction,
+    so a bad row is reported and skipped without failing the import, and a
+    chunk that trips a database constraint is rolled back and reported the
+    same way. Signals do not fire for bulk writes, so the search index,
+    cart totals and page caches are refreshed per chunk here.
+    """
+
+    def __init__(self, create_categories=False, chunk_size=IMPORT_CHUNK_SIZE):
+        self.categories = CategoryMap(create_missing=create_categories)
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, line_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'Line {line_number}: {message}')
+
+    def run(self, records):
+        """Import an iterable of (line_number, dict) pairs and return self."""
+        # {columns: {sku: (line_number, values)}}, one chunk per set of fields
+        pending = {}
+        for line_number, record in records:
+            if record is None:
+                self.error(line_number, 'not a JSON object')
+                continue
+            # A field the record leaves out keeps its stored value; it is never defaulted
+            columns = tuple(field for field in IMPORT_FIELDS if field in record and field != 'sku')
+            try:
+                values = _parse_record(record, columns, self.categories)
+            except ValueError as e:
+                self.error(line_number, e)
+                continue
+            sku = values['sku']
+            for other in [other for other, chunk in pending.items() if other != columns and sku in chunk]:
+                # The SKU's earlier row has other fields; write it first so rows apply in file order
+                self._write(pending.pop(other), other)
+            # A SKU repeated within the chunk: the later row wins
+            chunk = pending.setdefault(columns, {})
+            chunk[sku] = (line_number, values)
+            if len(chunk) >= self.chunk_size:
+                self._write(pending.pop(columns), columns)
+        for columns, chunk in pending.items():
+            self._write(chunk, columns)
+        if self.created or self.updated:
+            bump_catalog_version()
+        return self
+
+    def _write(self, chunk, columns):
+        skus = list(chunk)
+        existing = {
+            row[0]: row[1:] for row in Product.objects.filter(sku__in=skus).values_list(
+                'sku', 'pk', 'slug', 'name', 'category_id', 'price', 'description'
+            )
+        }
+
+        rows, new_rows = [], []
+        for sku, (line_number, values) in chunk.items():
+            if sku in existing:
+                # Columns the file leaves out keep their stored values on insert-or-update
+                _, slug, name, category_id, price, description = existing[sku]
+                values = {
+                    'name': name, 'category_id': category_id, 'price': price, 'description': description,
+                    **values, 'slug': slug,
+                }
+            else:
+                missing = [field for field in REQUIRED_FOR_NEW if field not in columns]
+                if missing:
+                    self.error(line_number, f'new SKU "{sku}" needs {", ".join(missing)}')
+                    continue
+                new_rows.append(values)
+            rows.append(values)
+        if not rows:
+            return
+        _assign_slugs(new_rows)
+
+        update_fields = list(columns) + ['updated_at']
+        try:
+            self._save(rows, new_rows, existing, columns, update_fields)
+        except IntegrityError as e:
+            # e.g. a slug taken by a concurrent import since _assign_slugs(); the chunk is rolled back
+            lines = sorted(line_number for line_number, _ in chunk.values())
+            self.error(lines[0], f'{len(rows)} rows up to line {lines[-1]} were not imported: {e}')
+            return
+
+        self.created += len(new_rows)
+        self.updated += len(rows) - len(new_rows)
+
+    def _save(self, rows, new_rows, existing, columns, update_fields):
+        """Upsert one chunk and refresh what depends on it, in one transaction."""
+        with write_atomic():
+            if connection.vendor == 'sqlite':
+                _upsert_sqlite(rows, update_fields)
+            else:
+                Product.objects.bulk_create(
+                    [Product(**values) for values in rows],
+                    update_conflicts=True,
+                    update_fields=update_fields,
+                    **conflict_target(['sku']),
+                )
+            updated_ids = [row[0] for row in existing.values()]
+            new_ids = list(Product.objects.filter(sku__in=[values['sku'] for values in new_rows]).values_list(
+                'pk', flat=True
+            )) if new_rows else []
+            if set(columns) & set(search.SEARCH_FIELDS):
+                search.index_products(updated_ids + new_ids)
+            else:
+                search.index_products(new_ids)
+            if updated_ids and 'price' in columns:
+                # New products cannot be in a cart yet
+                Cart.recalculate_totals(Cart.objects.filter(
+                    is_active=True,
+                    pk__in=CartItem.objects.filter(product_id__in=updated_ids).values('cart'),
+                ))
+
+            # Listings of the old and new categories; new products have no pages of their own yet
+            tags = {'catalog', 'home'}
+            tags.update(self.categories.listing_tags(
+                {values['category_id'] for values in rows} | {row[3] for row in existing.values()}
+            ))
+            tags.update(f'product:{pk}' for pk in updated_ids)
+            transaction.on_commit(lambda: purge_tags(*tags))
+
+
+def import_products(fileobj, file_format='csv', create_categories=False, chunk_size=IMPORT_CHUNK_SIZE):
+    """Import products from a binary CSV or JSONL file object; returns the ProductImporter."""
+    importer = ProductImporter(create_categories=create_categories, chunk_size=chunk_size)
+    return importer.run(read_records(fileobj, file_format))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from store.rollups import rebuild_customer_stats, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily order rollups and customer stats used by the admin dashboards'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding daily order rollups...')
+        written = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Successfully wrote {written} rollup rows.'))
+
+        self.stdout.write('Rebuilding customer stats...')
+        written = rebuild_customer_stats()
+        self.stdout.write(self.style.SUCCESS(f'Successfully wrote {written} customer stats rows.'))
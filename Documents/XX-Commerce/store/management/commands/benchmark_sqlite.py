@@ -0,0 +1,115 @@
+import multiprocessing
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from store.backends.sqlite3.base import apply_pragmas
+from store.models import Cart, Product
+
+
+def _worker(path, pragmas, begin, seconds, write_ratio, product_ids, cart_ids, tables, seed):
+    """Mixed read/write load on one connection; returns (reads, writes, lock errors)."""
+    product_table, cart_table = tables
+    conn = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(conn, pragmas)
+    rng = random.Random(seed)
+    reads = writes = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            if rng.random() < write_ratio:
+                # Read-then-write, like holding stock or placing an order
+                product_id = rng.choice(product_ids)
+                conn.execute(begin)
+                conn.execute(
+                    f'SELECT stock_quantity, reserved_quantity FROM {product_table} WHERE id = ?', [product_id]
+                ).fetchone()
+                conn.execute(
+                    f'UPDATE {product_table} SET reserved_quantity = reserved_quantity WHERE id = ?', [product_id]
+                )
+                conn.execute(
+                    f'UPDATE {cart_table} SET updated_at = ? WHERE id = ?',
+                    [timezone.now().isoformat(), rng.choice(cart_ids)],
+                )
+                conn.execute('COMMIT')
+                writes += 1
+            else:
+                conn.execute(
+                    f'SELECT id, name, price FROM {product_table} WHERE is_active = 1 '
+                    f'ORDER BY created_at DESC LIMIT 24 OFFSET ?', [rng.randrange(0, 5) * 24]
+                ).fetchall()
+                reads += 1
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            errors += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+    conn.close()
+    return reads, writes, errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent read/write throughput on a copy of the SQLite database '
+        'with stock settings and with the configured PRAGMAs and BEGIN IMMEDIATE'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent processes (default: 8)')
+        parser.add_argument('--seconds', type=float, default=10, help='Length of each run (default: 10)')
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.2, help='Share of operations that write (default: 0.2)'
+        )
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        if 'sqlite3' not in database['ENGINE']:
+            raise CommandError('The default database is not SQLite.')
+        product_ids = list(Product.objects.values_list('pk', flat=True)[:1000])
+        cart_ids = list(Cart.objects.values_list('pk', flat=True)[:1000])
+        if not product_ids or not cart_ids:
+            raise CommandError('The database needs some products and carts to benchmark with.')
+
+        tuned = database.get('OPTIONS', {}).get('pragmas', {})
+        runs = [
+            ('stock', {'journal_mode': 'delete'}, 'BEGIN'),
+            ('tuned', tuned, 'BEGIN IMMEDIATE'),
+        ]
+        tables = (Product._meta.db_table, Cart._meta.db_table)
+
+        self.stdout.write(
+            f'{options["workers"]} workers, {options["seconds"]:g}s per run, '
+            f'{options["write_ratio"]:.0%} writes'
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, pragmas, begin in runs:
+                path = str(Path(tmp) / f'{label}.sqlite3')
+                source = sqlite3.connect(database['NAME'])
+                target = sqlite3.connect(path)
+                source.backup(target)
+                source.close()
+                # journal_mode is stored in the file; set it before the workers connect
+                target.execute(f'PRAGMA journal_mode = {pragmas.get("journal_mode", "delete")}')
+                target.close()
+
+                # Workers open their own connections; none may be inherited
+                connections.close_all()
+                with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+                    results = pool.starmap(_worker, [
+                        (path, pragmas, begin, options['seconds'], options['write_ratio'],
+                         product_ids, cart_ids, tables, seed)
+                        for seed in range(options['workers'])
+                    ])
+                reads, writes, errors = (sum(column) for column in zip(*results))
+                seconds = options['seconds']
+                self.stdout.write(
+                    f'{label:>6}: {reads / seconds:9.0f} reads/s  {writes / seconds:8.0f} writes/s  '
+                    f'{errors} "database is locked" errors'
+                )
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from store.imports import IMPORT_CHUNK_SIZE, guess_format, import_products
+
+
+class Command(BaseCommand):
+    help = 'Create or update products from a CSV or JSON Lines file, matched by SKU'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='File format (default: guessed from the file extension)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help=f'Rows written per transaction (default: {IMPORT_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--create-categories',
+            action='store_true',
+            help='Create categories that do not exist yet instead of rejecting their rows',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        started = time.monotonic()
+        try:
+            with open(path, 'rb') as f:
+                result = import_products(
+                    f,
+                    file_format=options['format'] or guess_format(path),
+                    create_categories=options['create_categories'],
+                    chunk_size=options['chunk_size'],
+                )
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+        elapsed = time.monotonic() - started
+
+        for error in result.errors:
+            self.stdout.write(self.style.WARNING(error))
+        if result.error_count > len(result.errors):
+            self.stdout.write(self.style.WARNING(f'... and {result.error_count - len(result.errors)} more errors.'))
+
+        rows = result.created + result.updated
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {rows} products ({result.created} created, {result.updated} updated, '
+            f'{result.error_count} rejected) in {elapsed:.1f}s ({rows / max(elapsed, 0.001):.0f} rows/s).'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from store import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index'
+
+    def handle(self, *args, **options):
+        backend = search.search_backend()
+        if backend is None:
+            self.stdout.write(
+                self.style.WARNING('This database has no full-text backend; search falls back to substring matching.')
+            )
+            return
+
+        self.stdout.write(f'Rebuilding {backend} search index...')
+        indexed = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Successfully indexed {indexed} products.'))
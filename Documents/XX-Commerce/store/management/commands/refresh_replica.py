@@ -0,0 +1,32 @@
+import os
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Copy the SQLite database to the read replica file (REPLICA_DB_NAME)'
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        if 'sqlite3' not in database['ENGINE']:
+            raise CommandError('Only SQLite replicas are file copies; other replicas follow the primary themselves.')
+        if not settings.REPLICA_DB_NAME:
+            raise CommandError('REPLICA_DB_NAME is not set.')
+
+        # Copy next to the replica, then swap it in, so readers never see a partial file
+        replica = str(settings.REPLICA_DB_NAME)
+        partial = f'{replica}.partial'
+        source = sqlite3.connect(database['NAME'])
+        target = sqlite3.connect(partial)
+        try:
+            source.backup(target)
+            # Read-only connections cannot open a WAL database without its -shm file
+            target.execute('PRAGMA journal_mode = delete')
+        finally:
+            source.close()
+            target.close()
+        os.replace(partial, replica)
+
+        self.stdout.write(self.style.SUCCESS(f'Replica {replica} refreshed.'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from store.reservations import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Release stock held by carts whose reservations have expired'
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired stock reservations.'))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from store.export_jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued CSV export jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty instead of polling',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to wait between polls of an empty queue (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f'Running {job}...')
+            if run_job(job):
+                self.stdout.write(self.style.SUCCESS(f'Finished export job {job.pk}.'))
+            else:
+                self.stdout.write(self.style.ERROR(f'Export job {job.pk} failed.'))
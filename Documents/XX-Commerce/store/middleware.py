@@ -0,0 +1,55 @@
+from django.utils.functional import SimpleLazyObject
+
+from .cart_storage import get_storage, load_guest_cart, save_guest_cart
+from .models import Cart
+
+
+def _lookup_cart(request):
+    """Fetch the active cart row for this request with one indexed lookup.
+
+    Anonymous visitors get their GuestCart from the guest cart storage,
+    which costs no database query.
+    """
+    if not request.user.is_authenticated:
+        return load_guest_cart(request)
+
+    # At most one row matches, enforced by the active cart constraint
+    return Cart.objects.filter(user=request.user, is_active=True).first()
+
+
+def get_cart(request):
+    """Return the active cart (or None), resolving it at most once per request."""
+    if not hasattr(request, '_cached_cart'):
+        request._cached_cart = _lookup_cart(request)
+    return request._cached_cart
+
+
+def get_or_create_cart(request):
+    """Return the active cart, creating a customer's if needed; guest carts are never saved as rows."""
+    cart = get_cart(request)
+    if cart is None:
+        cart = Cart.get_or_create_cart(request.user)
+        request._cached_cart = cart
+        request.cart = SimpleLazyObject(lambda: get_cart(request))
+    return cart
+
+
+class CartMiddleware:
+    """Attach a lazily resolved `request.cart`.
+
+    The cart is only looked up the first time something reads it, so
+    requests that never touch the cart do no cart queries at all. A guest
+    cart changed by the view is written back to its storage on the way out.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.cart = SimpleLazyObject(lambda: get_cart(request))
+        response = self.get_response(request)
+        if getattr(request, 'guest_cart_merged', False):
+            get_storage().clear(request, response)
+        else:
+            save_guest_cart(request, response)
+        return response
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS store_product_fts USING fts5("
+            "name, short_description, description, sku, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO store_product_fts (rowid, name, short_description, description, sku) "
+            "SELECT id, name, short_description, description, sku FROM store_product"
+        )
+    elif vendor == "mysql":
+        schema_editor.execute(
+            "ALTER TABLE store_product ADD FULLTEXT INDEX store_product_fts "
+            "(name, short_description, description, sku)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS store_product_fts")
+    elif vendor == "mysql":
+        schema_editor.execute("ALTER TABLE store_product DROP INDEX store_product_fts")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0002_product_search_index"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="product",
+            options={
+                "ordering": ["-created_at"],
+                "verbose_name": "Product",
+                "verbose_name_plural": "Products",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["created_at", "id"], name="store_produ_created_8914b9_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["price", "id"], name="store_produ_price_aba1d8_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["name", "id"], name="store_produ_name_171327_idx"
+            ),
+        ),
+    ]
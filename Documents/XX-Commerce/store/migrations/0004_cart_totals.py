@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:41
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model("store", "Cart")
+    CartItem = apps.get_model("store", "CartItem")
+    money = models.DecimalField(max_digits=12, decimal_places=2)
+    items = (
+        CartItem.objects.filter(cart=models.OuterRef("pk")).order_by().values("cart")
+    )
+    Cart.objects.update(
+        item_count=Coalesce(
+            models.Subquery(
+                items.annotate(total=models.Sum("quantity")).values("total")
+            ),
+            0,
+        ),
+        subtotal=Coalesce(
+            models.Subquery(
+                items.annotate(
+                    total=models.Sum(
+                        models.F("quantity") * models.F("product__price"),
+                        output_field=money,
+                    )
+                ).values("total"),
+                output_field=money,
+            ),
+            models.Value(Decimal("0.00")),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0003_product_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cart",
+            name="item_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="cart",
+            name="subtotal",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.00"), max_digits=12
+            ),
+        ),
+        migrations.RunPython(backfill_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_primary_images(apps, schema_editor):
+    Product = apps.get_model("store", "Product")
+    ProductImage = apps.get_model("store", "ProductImage")
+    first_image = (
+        ProductImage.objects.filter(product=models.OuterRef("pk"))
+        .order_by("-is_primary", "sort_order", "created_at")
+        .values("pk")[:1]
+    )
+    Product.objects.update(primary_image=models.Subquery(first_image))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0004_cart_totals"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="primary_image",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="store.productimage",
+            ),
+        ),
+        migrations.RunPython(backfill_primary_images, migrations.RunPython.noop),
+    ]
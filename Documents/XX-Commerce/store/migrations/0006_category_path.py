@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:42
+
+from django.db import migrations, models
+
+
+def backfill_category_paths(apps, schema_editor):
+    Category = apps.get_model("store", "Category")
+    categories = list(Category.objects.all())
+    children = {}
+    for category in categories:
+        children.setdefault(category.parent_id, []).append(category)
+
+    # Walk the tree from the roots so every parent path is known first
+    stack = [(category, "") for category in children.get(None, [])]
+    while stack:
+        category, parent_path = stack.pop()
+        category.path = f"{parent_path}{category.pk}/"
+        category.depth = category.path.count("/") - 1
+        stack.extend((child, category.path) for child in children.get(category.pk, []))
+
+    Category.objects.bulk_update(categories, ["path", "depth"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0005_product_primary_image"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="path",
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(fields=["path"], name="store_categ_path_f23884_idx"),
+        ),
+        migrations.RunPython(backfill_category_paths, migrations.RunPython.noop),
+    ]
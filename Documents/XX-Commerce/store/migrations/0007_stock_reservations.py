@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0006_category_path"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="reserved_quantity",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name="StockReservation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("quantity", models.PositiveIntegerField()),
+                ("expires_at", models.DateTimeField()),
+                (
+                    "cart",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reservations",
+                        to="store.cart",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reservations",
+                        to="store.product",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["expires_at"], name="store_stock_expires_f1477d_idx"
+                    ),
+                    models.Index(
+                        fields=["product", "expires_at"],
+                        name="store_stock_product_abaa07_idx",
+                    ),
+                ],
+                "unique_together": {("cart", "product")},
+            },
+        ),
+    ]
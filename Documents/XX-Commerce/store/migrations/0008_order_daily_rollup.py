@@ -0,0 +1,87 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:52
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    Order = apps.get_model("store", "Order")
+    OrderItem = apps.get_model("store", "OrderItem")
+    OrderDailyRollup = apps.get_model("store", "OrderDailyRollup")
+    rows = {}
+    for row in (
+        Order.objects.annotate(day=TruncDate("created_at"))
+        .values("day", "status")
+        .annotate(orders=models.Count("id"), revenue=models.Sum("total_amount"))
+        .order_by()
+    ):
+        rows[row["day"], row["status"]] = OrderDailyRollup(
+            date=row["day"],
+            status=row["status"],
+            orders=row["orders"],
+            revenue=row["revenue"] or Decimal("0.00"),
+        )
+    for row in (
+        OrderItem.objects.annotate(day=TruncDate("order__created_at"))
+        .values("day", "order__status")
+        .annotate(items=models.Sum("quantity"))
+        .order_by()
+    ):
+        if (row["day"], row["order__status"]) in rows:
+            rows[row["day"], row["order__status"]].items = row["items"] or 0
+    OrderDailyRollup.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0007_stock_reservations"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderDailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("date", models.DateField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("shipped", "Shipped"),
+                            ("delivered", "Delivered"),
+                            ("cancelled", "Cancelled"),
+                            ("refunded", "Refunded"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("orders", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                ("items", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["date", "status"],
+                "unique_together": {("date", "status")},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:53
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_customer_stats(apps, schema_editor):
+    Order = apps.get_model("store", "Order")
+    CustomerStats = apps.get_model("store", "CustomerStats")
+    rows = (
+        Order.objects.values("user")
+        .annotate(
+            order_count=models.Count("id"),
+            total_spent=models.Sum("total_amount"),
+            last_order_at=models.Max("created_at"),
+        )
+        .order_by()
+    )
+    CustomerStats.objects.bulk_create(
+        [
+            CustomerStats(
+                user_id=row["user"],
+                order_count=row["order_count"],
+                total_spent=row["total_spent"] or Decimal("0.00"),
+                last_order_at=row["last_order_at"],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("store", "0008_order_daily_rollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerStats",
+            fields=[
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="customer_stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("order_count", models.PositiveIntegerField(default=0)),
+                (
+                    "total_spent",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                ("last_order_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name_plural": "Customer stats",
+                "indexes": [
+                    models.Index(
+                        fields=["-total_spent"], name="store_custo_total_s_7ec56f_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_customer_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0010_export_jobs"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="address",
+            index=models.Index(
+                fields=["last_name"], name="store_addre_last_na_77b304_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="address",
+            index=models.Index(
+                fields=["postal_code"], name="store_addre_postal__e1b5e0_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:00
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("store", "0011_address_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PriceChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "increase",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=10
+                    ),
+                ),
+                (
+                    "multiplier",
+                    models.DecimalField(
+                        decimal_places=4, default=Decimal("1.0000"), max_digits=8
+                    ),
+                ),
+                (
+                    "rounding",
+                    models.CharField(
+                        choices=[
+                            ("cent", "Nearest 0.01"),
+                            ("unit", "Nearest 1"),
+                            ("ten", "Nearest 10"),
+                            ("hundred", "Nearest 100"),
+                        ],
+                        default="cent",
+                        max_length=10,
+                    ),
+                ),
+                ("product_ids", models.JSONField(default=list)),
+                ("products_updated", models.PositiveIntegerField(default=0)),
+                (
+                    "changed_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="price_changes",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:06
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0012_price_changes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="product",
+            name="store_produ_name_5e57da_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="store_produ_slug_361302_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="store_produ_categor_6683b7_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="store_produ_price_2d55a6_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="store_produ_sku_8a55cb_idx",
+        ),
+    ]
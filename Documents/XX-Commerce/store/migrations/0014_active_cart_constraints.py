@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:20
+
+from django.db import migrations, models
+
+
+def check_no_duplicate_carts(apps, schema_editor):
+    """Stop, with instructions, if any owner still has several active carts.
+
+    The constraints below would reject them. Merging is left to the batched
+    `manage.py cleanup_carts`, run before this migration, so a large cart
+    table is never locked for a whole merge.
+    """
+    Cart = apps.get_model("store", "Cart")
+    for owner, active in (
+        ("user", models.Q(is_active=True, user__isnull=False)),
+        ("session_key", models.Q(is_active=True, user__isnull=True)),
+    ):
+        duplicated = (
+            Cart.objects.filter(active)
+            .values(owner)
+            .annotate(carts=models.Count("pk"))
+            .filter(carts__gt=1)
+        )
+        if duplicated.exists():
+            raise RuntimeError(
+                "Some customers or sessions have more than one active cart. "
+                "Run `python manage.py cleanup_carts`, then migrate again."
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0013_drop_redundant_product_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_duplicate_carts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="cart",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_active", True)),
+                fields=("user",),
+                name="unique_active_cart_per_user",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="cart",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_active", True), ("user__isnull", True)),
+                fields=("session_key",),
+                name="unique_active_cart_per_session",
+            ),
+        ),
+    ]
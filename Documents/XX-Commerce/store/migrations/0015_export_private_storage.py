@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:36
+
+from django.db import migrations, models
+import store.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0014_active_cart_constraints"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="exportjob",
+            name="file",
+            field=models.FileField(
+                blank=True, storage=store.models.export_storage, upload_to="%Y/%m/"
+            ),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:50
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+# auth_user belongs to django.contrib.auth, so its indexes for the user
+# autocomplete ("^username", "=email") are added through the schema editor
+USER_INDEXES = [
+    models.Index(
+        django.db.models.functions.text.Lower("username"),
+        name="store_user_username_lower",
+    ),
+    models.Index(
+        django.db.models.functions.text.Lower("email"),
+        name="store_user_email_lower",
+    ),
+]
+
+
+def add_user_indexes(apps, schema_editor):
+    User = apps.get_model("auth", "User")
+    for index in USER_INDEXES:
+        schema_editor.add_index(User, index)
+
+
+def remove_user_indexes(apps, schema_editor):
+    User = apps.get_model("auth", "User")
+    for index in USER_INDEXES:
+        schema_editor.remove_index(User, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("store", "0015_export_private_storage"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="address",
+            name="store_addre_last_na_77b304_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="address",
+            name="store_addre_postal__e1b5e0_idx",
+        ),
+        migrations.AddIndex(
+            model_name="address",
+            index=models.Index(
+                django.db.models.functions.text.Lower("last_name"),
+                name="store_address_last_name_lower",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="address",
+            index=models.Index(
+                django.db.models.functions.text.Lower("postal_code"),
+                name="store_address_postal_lower",
+            ),
+        ),
+        migrations.RunPython(add_user_indexes, remove_user_indexes),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models.functions import Coalesce, Concat, Lower, Substr
 from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from decimal import Decimal
@@ -23,6 +26,10 @@ class Category(TimeStampedModel):
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
     is_active = models.BooleanField(default=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    
+    # Materialized path of ancestor ids, e.g. "1/5/12/", maintained on save
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -31,6 +38,7 @@ class Category(TimeStampedModel):
             models.Index(fields=['name']),
             models.Index(fields=['slug']),
             models.Index(fields=['is_active']),
+            models.Index(fields=['path']),
         ]
 
     def __str__(self):
@@ -40,6 +48,69 @@ class Category(TimeStampedModel):
         from django.urls import reverse
         return reverse('store:category_detail', kwargs={'slug': self.slug})
 
+    def clean(self):
+        """Prevent moving a category underneath itself."""
+        from django.core.exceptions import ValidationError
+        if self.pk and self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+            if str(self.pk) in parent_path.split('/'):
+                raise ValidationError({'parent': 'A category cannot be moved under itself or its descendants.'})
+
+    def save(self, *args, **kwargs):
+        old_path, old_depth = self.path, self.depth
+        super().save(*args, **kwargs)
+        
+        parent_path = ''
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+        path = f'{parent_path}{self.pk}/'
+        if path == old_path:
+            return
+        
+        depth = path.count('/') - 1
+        Category.objects.filter(pk=self.pk).update(path=path, depth=depth)
+        if old_path:
+            # Moved: re-root every descendant onto the new path in one UPDATE
+            Category.subtree(old_path).exclude(pk=self.pk).update(
+                path=Concat(models.Value(path), Substr('path', len(old_path) + 1)),
+                depth=models.F('depth') + (depth - old_depth),
+            )
+        self.path, self.depth = path, depth
+
+        # post_save fired before the new path was written, so it purged only the
+        # old ancestors; the listings of the new ones change too
+        from .page_cache import purge_tags
+        purge_tags(*{f'category:{pk}' for pk in (old_path + path).split('/') if pk})
+
+    @staticmethod
+    def subtree_filter(path, field='path'):
+        """Q matching `path` and everything below it on a materialized path column.
+
+        Paths are ids separated by '/', and '0' sorts right after '/', so a
+        subtree is the half-open range [path, path[:-1] + '0'), which any
+        index on the column can serve.
+        """
+        return models.Q(**{f'{field}__gte': path, f'{field}__lt': path[:-1] + '0'})
+
+    @classmethod
+    def subtree(cls, path):
+        """Categories at or below the given path."""
+        return cls.objects.filter(cls.subtree_filter(path))
+
+    def get_descendants(self, include_self=True):
+        """Get this category and all of its descendants."""
+        descendants = Category.subtree(self.path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+
+    def get_ancestors(self, include_self=False):
+        """Get ancestors from the root down, in a single query."""
+        ids = [int(pk) for pk in self.path.split('/') if pk]
+        if not include_self:
+            ids = ids[:-1]
+        return Category.objects.filter(pk__in=ids).order_by('depth')
+
 
 class Product(TimeStampedModel):
     """Main product model with inventory management."""
@@ -59,6 +130,8 @@ class Product(TimeStampedModel):
     stock_quantity = models.PositiveIntegerField(default=0)
     track_inventory = models.BooleanField(default=True)
     allow_backorder = models.BooleanField(default=False)
+    # Units held by StockReservation rows, kept in step by store.reservations
+    reserved_quantity = models.PositiveIntegerField(default=0, editable=False)
     
     # Product details
     weight = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
@@ -71,24 +144,44 @@ class Product(TimeStampedModel):
     # SEO
     meta_title = models.CharField(max_length=200, blank=True)
     meta_description = models.TextField(blank=True)
+    
+    # Denormalized pointer to the image shown on product cards, maintained by ProductImage
+    primary_image = models.ForeignKey(
+        'ProductImage', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', editable=False
+    )
 
     class Meta:
         verbose_name = "Product"
         verbose_name_plural = "Products"
         ordering = ['-created_at']
+        # slug and sku are indexed by their unique constraints, category by its
+        # foreign key, and name/price by the (column, id) indexes below; every
+        # extra index slows down imports and price updates
         indexes = [
-            models.Index(fields=['name']),
-            models.Index(fields=['slug']),
-            models.Index(fields=['category']),
             models.Index(fields=['is_active']),
             models.Index(fields=['is_featured']),
-            models.Index(fields=['price']),
-            models.Index(fields=['sku']),
+            # Keyset pagination seeks on (sort column, id)
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['price', 'id']),
+            models.Index(fields=['name', 'id']),
         ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored price so saves can tell whether it changed
+        instance._loaded_price = instance.__dict__.get('price')
+        return instance
+
+    @property
+    def price_changed(self):
+        """Whether the price differs from the value loaded from the database."""
+        return self.price != getattr(self, '_loaded_price', self.price)
+
     def get_absolute_url(self):
         from django.urls import reverse
         return reverse('store:product_detail', kwargs={'slug': self.slug})
@@ -109,12 +202,17 @@ class Product(TimeStampedModel):
         
         super().save(*args, **kwargs)
 
+    @property
+    def available_quantity(self):
+        """Stock not held by other carts."""
+        return max(self.stock_quantity - self.reserved_quantity, 0)
+
     @property
     def is_in_stock(self):
         """Check if product is in stock."""
         if not self.track_inventory:
             return True
-        return self.stock_quantity > 0
+        return self.available_quantity > 0
 
     @property
     def discount_percentage(self):
@@ -137,13 +235,13 @@ class Product(TimeStampedModel):
             return False
         return True
 
-    @property
-    def primary_image(self):
-        """Get the primary image for this product."""
-        try:
-            return self.images.filter(is_primary=True).first()
-        except:
-            return None
+    @staticmethod
+    def refresh_primary_images(queryset):
+        """Point primary_image at the flagged image, else the first by sort order, in one UPDATE."""
+        first_image = ProductImage.objects.filter(
+            product=models.OuterRef('pk')
+        ).order_by('-is_primary', 'sort_order', 'created_at').values('pk')[:1]
+        return queryset.update(primary_image=models.Subquery(first_image))
 
 
 class ProductImage(TimeStampedModel):
@@ -169,6 +267,7 @@ class ProductImage(TimeStampedModel):
         if self.is_primary:
             ProductImage.objects.filter(product=self.product, is_primary=True).update(is_primary=False)
         super().save(*args, **kwargs)
+        Product.refresh_primary_images(Product.objects.filter(pk=self.product_id))
 
 
 class Address(TimeStampedModel):
@@ -197,6 +296,9 @@ class Address(TimeStampedModel):
         indexes = [
             models.Index(fields=['user', 'address_type']),
             models.Index(fields=['user', 'is_default']),
+            # Case-insensitive prefix lookups for the admin address autocomplete
+            models.Index(Lower('last_name'), name='store_address_last_name_lower'),
+            models.Index(Lower('postal_code'), name='store_address_postal_lower'),
         ]
 
     def __str__(self):
@@ -218,6 +320,10 @@ class Cart(TimeStampedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='carts', null=True, blank=True)
     session_key = models.CharField(max_length=40, blank=True)
     is_active = models.BooleanField(default=True)
+    
+    # Denormalized totals, kept in step with CartItem changes and product prices
+    item_count = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
 
     class Meta:
         indexes = [
@@ -225,6 +331,22 @@ class Cart(TimeStampedModel):
             models.Index(fields=['session_key']),
             models.Index(fields=['is_active']),
         ]
+        constraints = [
+            # One active cart per customer and per guest session; the partial
+            # unique indexes also serve the active cart lookup. Only SQLite
+            # and PostgreSQL enforce conditional constraints: MySQL skips
+            # them (models.W036), see get_or_create_cart()
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(is_active=True),
+                name='unique_active_cart_per_user',
+            ),
+            models.UniqueConstraint(
+                fields=['session_key'],
+                condition=models.Q(is_active=True, user__isnull=True),
+                name='unique_active_cart_per_session',
+            ),
+        ]
 
     def __str__(self):
         if self.user:
@@ -234,45 +356,54 @@ class Cart(TimeStampedModel):
     @property
     def total_items(self):
         """Get total number of items in cart."""
-        return self.items.aggregate(total=models.Sum('quantity'))['total'] or 0
+        return self.item_count
 
     @property
     def total_price(self):
-        """Calculate total price of all items in cart."""
-        total = Decimal('0.00')
-        for item in self.items.all():
-            total += item.line_total
-        return total
+        """Get total price of all items in cart."""
+        return self.subtotal
+
+    @staticmethod
+    def recalculate_totals(queryset):
+        """Recompute item_count and subtotal for every cart in queryset with one UPDATE."""
+        items = CartItem.objects.filter(cart=models.OuterRef('pk')).order_by().values('cart')
+        item_count = items.annotate(total=models.Sum('quantity')).values('total')
+        subtotal = items.annotate(
+            total=models.Sum(
+                models.F('quantity') * models.F('product__price'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            )
+        ).values('total')
+        return queryset.update(
+            item_count=Coalesce(models.Subquery(item_count), 0),
+            subtotal=Coalesce(
+                models.Subquery(subtotal, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+                models.Value(Decimal('0.00')),
+            ),
+        )
+
+    def update_totals(self):
+        """Recompute this cart's totals and reload them onto the instance."""
+        Cart.recalculate_totals(Cart.objects.filter(pk=self.pk))
+        self.refresh_from_db(fields=['item_count', 'subtotal'])
 
     @staticmethod
     def get_or_create_cart(user=None, session_key=None):
-        """Get existing cart or create new one. Handles duplicate carts by keeping the most recent one."""
+        """Get the owner's active cart or create it.
+
+        The partial unique constraints make this race-safe: a concurrent
+        insert fails and get_or_create() returns the row that won. On MySQL,
+        which does not enforce them, a race can leave two active carts; the
+        oldest is then used.
+        """
         if user and user.is_authenticated:
-            # First check if there are multiple active carts for this user
-            active_carts = Cart.objects.filter(user=user, is_active=True)
-            if active_carts.count() > 1:
-                # Keep the most recent cart and deactivate others
-                cart = active_carts.order_by('-created_at').first()
-                active_carts.exclude(id=cart.id).update(is_active=False)
-                return cart
-            elif active_carts.count() == 1:
-                return active_carts.first()
-            else:
-                # No active cart, create a new one
-                return Cart.objects.create(user=user, is_active=True, session_key='')
+            owner = {'user': user}
         else:
-            # First check if there are multiple active carts for this session
-            active_carts = Cart.objects.filter(session_key=session_key, is_active=True)
-            if active_carts.count() > 1:
-                # Keep the most recent cart and deactivate others
-                cart = active_carts.order_by('-created_at').first()
-                active_carts.exclude(id=cart.id).update(is_active=False)
-                return cart
-            elif active_carts.count() == 1:
-                return active_carts.first()
-            else:
-                # No active cart, create a new one
-                return Cart.objects.create(session_key=session_key, is_active=True, user=None)
+            owner = {'session_key': session_key, 'user': None}
+        try:
+            return Cart.objects.get_or_create(**owner, is_active=True)[0]
+        except Cart.MultipleObjectsReturned:
+            return Cart.objects.filter(**owner, is_active=True).order_by('pk').first()
 
 
 class CartItem(TimeStampedModel):
@@ -304,6 +435,28 @@ class CartItem(TimeStampedModel):
             raise ValidationError("Not enough stock available")
 
 
+class StockReservation(TimeStampedModel):
+    """Units of a product held for a cart until `expires_at`."""
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['cart', 'product']
+        indexes = [
+            models.Index(fields=['expires_at']),
+            models.Index(fields=['product', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product_id} for cart {self.cart_id}"
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+
 class Order(TimeStampedModel):
     """Customer orders."""
     ORDER_STATUS = [
@@ -366,12 +519,8 @@ class Order(TimeStampedModel):
 
     def generate_order_number(self):
         """Generate unique order number."""
-        import random
-        import string
-        while True:
-            order_number = ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
-            if not Order.objects.filter(order_number=order_number).exists():
-                return order_number
+        from .order_numbers import next_order_number
+        return next_order_number()
 
     @property
     def total_items(self):
@@ -412,6 +561,117 @@ class OrderItem(TimeStampedModel):
         return self.price * self.quantity
 
 
+class OrderDailyRollup(TimeStampedModel):
+    """Per-day, per-status order totals, maintained by store.rollups."""
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.ORDER_STATUS)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    items = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['date', 'status']
+        unique_together = ['date', 'status']
+
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.orders} orders"
+
+
+class CustomerStats(TimeStampedModel):
+    """Per-customer order totals, maintained by store.rollups."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='customer_stats')
+    order_count = models.PositiveIntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    last_order_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'Customer stats'
+        indexes = [
+            models.Index(fields=['-total_spent']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.order_count} orders"
+
+
+def export_storage():
+    """Storage for export files: EXPORT_ROOT, which has no public URL."""
+    return FileSystemStorage(location=settings.EXPORT_ROOT, base_url=None)
+
+
+class ExportJob(TimeStampedModel):
+    """A queued CSV export, processed by `manage.py run_export_worker`."""
+    EXPORT_TYPES = [
+        ('products', 'Products'),
+        ('orders', 'Orders'),
+        ('customers', 'Customers'),
+    ]
+
+    JOB_STATUS = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    export_type = models.CharField(max_length=20, choices=EXPORT_TYPES)
+    status = models.CharField(max_length=20, choices=JOB_STATUS, default='queued')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+    
+    # Filters
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    
+    # Progress
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='%Y/%m/', storage=export_storage, blank=True)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_export_type_display()} export #{self.pk} ({self.status})"
+
+    @property
+    def progress(self):
+        """Percentage of rows written so far."""
+        if self.status == 'done':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(int(self.processed_rows * 100 / self.total_rows), 99)
+
+
+class PriceChange(TimeStampedModel):
+    """Audit row for one batch of a bulk price update."""
+    ROUNDING_CHOICES = [
+        ('cent', 'Nearest 0.01'),
+        ('unit', 'Nearest 1'),
+        ('ten', 'Nearest 10'),
+        ('hundred', 'Nearest 100'),
+    ]
+
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='price_changes')
+    increase = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    multiplier = models.DecimalField(max_digits=8, decimal_places=4, default=Decimal('1.0000'))
+    rounding = models.CharField(max_length=10, choices=ROUNDING_CHOICES, default='cent')
+    product_ids = models.JSONField(default=list)
+    products_updated = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Price change #{self.pk}: +{self.increase} x{self.multiplier} ({self.products_updated} products)"
+
+
 class Coupon(TimeStampedModel):
     """Discount coupons."""
     COUPON_TYPES = [
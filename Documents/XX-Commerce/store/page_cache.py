@@ -0,0 +1,122 @@
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+
+
+PAGE_KEY_PREFIX = 'store:page:'
+TAG_KEY_PREFIX = 'store:pagetag:'
+
+
+def _page_key(request):
+    """Cache key from the path plus a normalized (sorted, non-empty) query string."""
+    params = sorted(
+        (key, value)
+        for key, values in request.GET.lists()
+        for value in values
+        if value
+    )
+    raw = f'{request.path}?{urlencode(params)}'
+    return PAGE_KEY_PREFIX + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _tag_key(tag):
+    return TAG_KEY_PREFIX + tag
+
+
+def _tag_versions(tags):
+    """Current version of every tag, creating missing ones."""
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update({keys[key]: version for key, version in missing.items()})
+    return versions
+
+
+def purge_tags(*tags):
+    """Invalidate every cached page carrying any of the given tags."""
+    if tags:
+        cache.set_many({_tag_key(tag): time.time_ns() for tag in tags}, None)
+
+
+def purge_products(product_ids):
+    """Invalidate pages showing any of the given products."""
+    purge_tags(*(f'product:{pk}' for pk in product_ids))
+
+
+def product_listing_tags(queryset):
+    """Tags for a Product queryset's pages and every listing its products can appear in.
+
+    For changes made with queryset.update(), which sends no signals; collect
+    the tags before the update in case it changes which rows match.
+    """
+    tags = {'catalog', 'home'}
+    for pk, path in queryset.values_list('pk', 'category__path'):
+        tags.add(f'product:{pk}')
+        tags.update(f'category:{category_pk}' for category_pk in path.split('/') if category_pk)
+    return tags
+
+
+def add_cache_tags(request, *tags):
+    """Record surrogate-key tags for the page being rendered (no-op if not cacheable)."""
+    page_tags = getattr(request, 'page_cache_tags', None)
+    if page_tags is not None:
+        page_tags.update(tags)
+
+
+def is_page_cache_render(request):
+    """Whether the current response is being rendered for the shared page cache."""
+    return getattr(request, 'page_cache_tags', None) is not None
+
+
+def _cacheable(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(messages.get_messages(request))
+    )
+
+
+def cache_anonymous_page(view_func):
+    """Serve anonymous GET requests from a shared page cache.
+
+    Views call add_cache_tags() to label the page (e.g. "product:12");
+    purge_tags() with any of those labels invalidates it. Per-visitor bits
+    (cart badge, CSRF token) are filled in client side from the
+    session_fragment endpoint.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable(request):
+            return view_func(request, *args, **kwargs)
+
+        key = _page_key(request)
+        entry = cache.get(key)
+        if entry is not None and _tag_versions(entry['tags']) == entry['tags']:
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+            response['X-Page-Cache'] = 'hit'
+            return response
+
+        request.page_cache_tags = set()
+        response = view_func(request, *args, **kwargs)
+        tags = request.page_cache_tags
+        del request.page_cache_tags
+
+        if response.status_code == 200 and not response.streaming and tags:
+            cache.set(key, {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'tags': _tag_versions(tags),
+            }, settings.PAGE_CACHE_TIMEOUT)
+        response['X-Page-Cache'] = 'miss'
+        return response
+
+    return wrapper
@@ -0,0 +1,135 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.db.models import Q
+
+
+CURSOR_SALT = 'store.pagination.cursor'
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values, direction, ordering):
+    """Turn the sort key of a boundary row into an opaque, signed token bound to `ordering`."""
+    return signing.dumps(
+        {'v': [_encode_value(value) for value in values], 'd': direction, 'o': list(ordering)},
+        salt=CURSOR_SALT,
+        compress=True,
+    )
+
+
+def decode_cursor(token, ordering):
+    """Return (values, direction) for a token, or (None, 'next') if it is invalid.
+
+    A token made for another ordering (say a name cursor against a price
+    sort) is invalid too: its values would not fit the fields.
+    """
+    try:
+        data = signing.loads(token, salt=CURSOR_SALT)
+        if data['o'] != list(ordering) or len(data['v']) != len(ordering):
+            return None, 'next'
+        return data['v'], data['d']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None, 'next'
+
+
+def _seek_filter(ordering, values, reverse=False):
+    """Build the WHERE clause selecting rows strictly after `values` in `ordering`.
+
+    For ordering (a, b) that is `a > x OR (a = x AND b > y)`, with each
+    comparison flipped for descending fields. A redundant `a >= x` bound is
+    added so the database can range-scan the leading index column.
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        if descending != reverse:
+            lookup = 'lt'
+        else:
+            lookup = 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+
+    leading = ordering[0]
+    lookup = 'lte' if leading.startswith('-') != reverse else 'gte'
+    return Q(**{f'{leading.lstrip("-")}__{lookup}': values[0]}) & condition
+
+
+def _reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class KeysetPage:
+    """One page of results fetched with a seek predicate instead of OFFSET."""
+
+    def __init__(self, object_list, ordering, has_next, has_previous):
+        self.object_list = object_list
+        self.ordering = ordering
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _cursor(self, obj, direction):
+        return encode_cursor(
+            [getattr(obj, field.lstrip('-')) for field in self.ordering], direction, self.ordering
+        )
+
+    @property
+    def next_cursor(self):
+        if not self.has_next:
+            return ''
+        return self._cursor(self.object_list[-1], 'next')
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous:
+            return ''
+        return self._cursor(self.object_list[0], 'prev')
+
+
+def paginate_keyset(queryset, ordering, cursor=None, per_page=12):
+    """Return a KeysetPage of `queryset` sorted by `ordering`.
+
+    `ordering` must end in a unique field (normally `id`) so that every row
+    has a distinct sort key. No COUNT query is issued and the cost of a page
+    does not depend on how deep it is.
+    """
+    values, direction = decode_cursor(cursor, ordering) if cursor else (None, 'next')
+
+    backwards = values is not None and direction == 'prev'
+    if backwards:
+        queryset = queryset.filter(_seek_filter(ordering, values, reverse=True))
+        queryset = queryset.order_by(*_reverse_ordering(ordering))
+    else:
+        if values is not None:
+            queryset = queryset.filter(_seek_filter(ordering, values))
+        queryset = queryset.order_by(*ordering)
+
+    rows = list(queryset[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if backwards:
+        rows.reverse()
+        return KeysetPage(rows, ordering, has_next=True, has_previous=has_more)
+    return KeysetPage(rows, ordering, has_next=has_more, has_previous=values is not None)
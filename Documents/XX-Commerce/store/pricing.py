@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Greatest, Round
+
+from .cache import bump_catalog_version
+from .db import write_atomic
+from .models import Cart, CartItem, PriceChange, Product
+from .page_cache import product_listing_tags, purge_tags
+
+
+PRICE_BATCH_SIZE = 1000
+
+ROUNDING_STEPS = {
+    'cent': Decimal('0.01'),
+    'unit': Decimal('1'),
+    'ten': Decimal('10'),
+    'hundred': Decimal('100'),
+}
+
+MIN_PRICE = Decimal('0.01')
+
+
+def _decimal(value):
+    return Value(value, output_field=DecimalField(max_digits=12, decimal_places=4))
+
+
+def price_expression(increase, multiplier, rounding):
+    """SQL for (price + increase) * multiplier, rounded half up to the rule's step.
+
+    Rounding happens in the database on the full-precision result, so there
+    is no float arithmetic and no per-row Python.
+    """
+    step = ROUNDING_STEPS[rounding]
+    price = F('price')
+    if increase:
+        price = price + _decimal(increase)
+    if multiplier != 1:
+        price = price * _decimal(multiplier)
+
+    if step < 1:
+        rounded = Round(price, precision=-step.as_tuple().exponent)
+    else:
+        # Multiply by the reciprocal, which avoids integer division on SQLite
+        rounded = Round(price * _decimal(1 / step)) * _decimal(step)
+    return Greatest(rounded, _decimal(MIN_PRICE), output_field=DecimalField(max_digits=10, decimal_places=2))
+
+
+def _batches(queryset):
+    """Primary keys of `queryset` in PRICE_BATCH_SIZE chunks, walked by keyset."""
+    pks = queryset.order_by().values_list('pk', flat=True)
+    last_pk = 0
+    while True:
+        batch = list(pks.filter(pk__gt=last_pk).order_by('pk')[:PRICE_BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1]
+
+
+def _apply_batch(batch, expression, user, increase, multiplier, rounding):
+    products = Product.objects.filter(pk__in=batch)
+    tags = product_listing_tags(products)
+    with write_atomic():
+        updated = products.update(price=expression)
+        PriceChange.objects.create(
+            changed_by=user,
+            increase=increase,
+            multiplier=multiplier,
+            rounding=rounding,
+            product_ids=batch,
+            products_updated=updated,
+        )
+        # Denormalized cart subtotals use the live product price
+        Cart.recalculate_totals(Cart.objects.filter(
+            is_active=True,
+            pk__in=CartItem.objects.filter(product_id__in=batch).values('cart'),
+        ))
+        transaction.on_commit(lambda: purge_tags(*tags))
+    return updated
+
+
+def update_prices(queryset, increase=Decimal('0'), multiplier=Decimal('1'), rounding='cent', user=None):
+    """Reprice every product in `queryset` with set-based UPDATEs.
+
+    Each batch of PRICE_BATCH_SIZE products is one UPDATE plus an audit row
+    and a cart total refresh, committed on its own. Returns the number of
+    products updated. Raises ValidationError for an unusable rule.
+    """
+    if rounding not in ROUNDING_STEPS:
+        raise ValidationError(f'Unknown rounding rule "{rounding}".')
+    if multiplier <= 0:
+        raise ValidationError('The price multiplier must be greater than zero.')
+
+    expression = price_expression(increase, multiplier, rounding)
+    updated = 0
+    for batch in _batches(queryset):
+        updated += _apply_batch(batch, expression, user, increase, multiplier, rounding)
+    if updated:
+        bump_catalog_version()
+    return updated
@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .db import write_atomic
+from .models import Product, StockReservation
+from .page_cache import purge_products
+
+
+SWEEP_BATCH_SIZE = 1000
+
+
+def _needs_hold(product):
+    return product.track_inventory and not product.allow_backorder
+
+
+def _take(product_id, quantity):
+    """Move `quantity` units into Product.reserved_quantity if that many are free.
+
+    The availability check and the increment are a single UPDATE, so
+    concurrent holds on one product can never exceed its stock.
+    """
+    taken = Product.objects.filter(
+        pk=product_id,
+        stock_quantity__gte=F('reserved_quantity') + quantity,
+    ).update(reserved_quantity=F('reserved_quantity') + quantity)
+    if taken:
+        # Queryset updates skip the post_save signals that purge cached pages
+        transaction.on_commit(lambda: purge_products([product_id]))
+    return taken
+
+
+def _give_back(totals):
+    """Subtract {product_id: quantity} from the reserved counters in one UPDATE."""
+    if not totals:
+        return
+    released = Case(*(When(pk=pk, then=Value(quantity)) for pk, quantity in totals.items()))
+    Product.objects.filter(pk__in=totals).update(
+        reserved_quantity=Greatest(F('reserved_quantity') - released, Value(0))
+    )
+    product_ids = list(totals)
+    transaction.on_commit(lambda: purge_products(product_ids))
+
+
+def hold_stock(cart, product, quantity):
+    """Set the cart's hold on `product` to `quantity` units, renewing its TTL.
+
+    Raises ValidationError if the extra units are not available. Products
+    that do not track inventory or allow backorders are never held.
+    """
+    if not _needs_hold(product):
+        return
+
+    holds = StockReservation.objects.select_for_update().filter(cart=cart, product=product)
+    with write_atomic():
+        hold = holds.first()
+        delta = quantity - (hold.quantity if hold else 0)
+
+        if delta > 0 and not _take(product.pk, delta):
+            # Expired holds may still be counted if the sweeper has not run yet.
+            # This cart's own hold can be one of them, so read it again after
+            release_expired(product_ids=[product.pk])
+            hold = holds.first()
+            delta = quantity - (hold.quantity if hold else 0)
+            if delta > 0 and not _take(product.pk, delta):
+                available = Product.objects.filter(pk=product.pk).values_list(
+                    'stock_quantity', 'reserved_quantity'
+                ).first()
+                free = max(available[0] - available[1], 0) if available else 0
+                raise ValidationError(f'Only {free} more of {product.name} available.')
+        if delta < 0:
+            _give_back({product.pk: -delta})
+
+        if quantity <= 0:
+            if hold:
+                hold.delete()
+        elif hold:
+            hold.quantity = quantity
+            hold.expires_at = timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+            hold.save(update_fields=['quantity', 'expires_at', 'updated_at'])
+        else:
+            StockReservation.objects.create(
+                cart=cart,
+                product=product,
+                quantity=quantity,
+                expires_at=timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL),
+            )
+
+
+def _release_batch(holds):
+    """Delete up to SWEEP_BATCH_SIZE of `holds`, returning their units to the pool."""
+    with write_atomic():
+        rows = list(
+            holds.select_for_update().order_by('pk')
+            .values_list('pk', 'product_id', 'quantity')[:SWEEP_BATCH_SIZE]
+        )
+        if rows:
+            totals = {}
+            for _, product_id, quantity in rows:
+                totals[product_id] = totals.get(product_id, 0) + quantity
+            StockReservation.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+            _give_back(totals)
+    return len(rows)
+
+
+def release_holds(holds):
+    """Delete a StockReservation queryset, returning its units to the pool."""
+    released = 0
+    while True:
+        batch = _release_batch(holds)
+        if not batch:
+            return released
+        released += batch
+
+
+def release_expired(product_ids=None, now=None):
+    """Delete expired holds and return their units to the pool.
+
+    Works in batches, each costing a constant number of queries however many
+    holds a product has. Returns the number of holds released.
+    """
+    expired = StockReservation.objects.filter(expires_at__lte=now or timezone.now())
+    if product_ids is not None:
+        expired = expired.filter(product_id__in=product_ids)
+    return release_holds(expired)
+
+
+def release_cart_holds(cart_ids):
+    """Drop every hold belonging to the given carts."""
+    return release_holds(StockReservation.objects.filter(cart_id__in=cart_ids))
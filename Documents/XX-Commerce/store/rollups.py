@@ -0,0 +1,285 @@
+import logging
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .db import conflict_target, write_atomic
+from .models import CustomerStats, Order, OrderDailyRollup, OrderItem
+
+
+logger = logging.getLogger(__name__)
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _rollup_rows(orders, items, day_field):
+    """Build OrderDailyRollup rows from per-(day, status) order and item aggregates."""
+    rows = {}
+    for row in orders:
+        rows[row[day_field], row['status']] = OrderDailyRollup(
+            date=row[day_field],
+            status=row['status'],
+            orders=row['orders'],
+            revenue=row['revenue'] or Decimal('0.00'),
+        )
+    for row in items:
+        rollup = rows.get((row[day_field], row['order__status']))
+        if rollup is not None:
+            rollup.items = row['items'] or 0
+    return list(rows.values())
+
+
+def _save(rows):
+    OrderDailyRollup.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        update_fields=['orders', 'revenue', 'items', 'updated_at'],
+        **conflict_target(['date', 'status']),
+    )
+
+
+def _on_commit(func, *args, **kwargs):
+    """Run func(*args, **kwargs) once the current transaction commits.
+
+    The order change has already been saved by then, so a failure is logged
+    instead of failing the request; backfill_order_rollups repairs the rows.
+    """
+    def run():
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception('Updating order rollups failed; run backfill_order_rollups to repair them')
+
+    transaction.on_commit(run)
+
+
+def _adjust(day, status, orders=0, revenue=Decimal('0.00'), items=0):
+    """Add the deltas to one rollup row with F() expressions, creating the row if needed."""
+    rollups = OrderDailyRollup.objects.filter(date=day, status=status)
+    changes = {
+        'orders': F('orders') + orders,
+        'revenue': F('revenue') + revenue,
+        'items': F('items') + items,
+        'updated_at': timezone.now(),
+    }
+    with write_atomic():
+        if rollups.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                OrderDailyRollup.objects.create(
+                    date=day, status=status, orders=max(orders, 0), revenue=revenue, items=max(items, 0)
+                )
+        except IntegrityError:
+            # Another connection created the row since the UPDATE
+            rollups.update(**changes)
+
+
+def record_order(order, old=None):
+    """Apply a saved order to the rollups once the transaction commits.
+
+    `old` is the order's (created_at, status, total_amount) before the save,
+    or None for a new order. Only the changed amounts are added, so no day
+    is re-aggregated; an order that changes day or status moves its counts,
+    items included, from the old row to the new one.
+    """
+    day = timezone.localdate(order.created_at)
+    if old is None:
+        _on_commit(_adjust, day, order.status, orders=1, revenue=order.total_amount)
+        return
+    old_created_at, old_status, old_total = old
+    old_day = timezone.localdate(old_created_at)
+    if (old_day, old_status) == (day, order.status):
+        if order.total_amount != old_total:
+            _on_commit(_adjust, day, order.status, revenue=order.total_amount - old_total)
+        return
+    items = order.items.aggregate(items=Sum('quantity'))['items'] or 0
+    _on_commit(_adjust, old_day, old_status, orders=-1, revenue=-old_total, items=-items)
+    _on_commit(_adjust, day, order.status, orders=1, revenue=order.total_amount, items=items)
+
+
+def record_order_deleted(order):
+    """Take a deleted order off the rollups; its items are taken off as they are deleted."""
+    day = timezone.localdate(order.created_at)
+    _on_commit(_adjust, day, order.status, orders=-1, revenue=-order.total_amount)
+
+
+def record_items(order_id, quantity):
+    """Add `quantity` item units (negative to remove them) to the rollup row of an order."""
+    row = Order.objects.filter(pk=order_id).values_list('created_at', 'status').first()
+    if row is not None and quantity:
+        _on_commit(_adjust, timezone.localdate(row[0]), row[1], items=quantity)
+
+
+def refresh_day(day):
+    """Recompute the rollup rows of one day from its orders.
+
+    For changes made with queryset.update(), which sends no signals. Filters
+    on a created_at range, so only that day's orders are read.
+    """
+    start, end = _day_bounds(day)
+    orders = (
+        Order.objects.filter(created_at__gte=start, created_at__lt=end)
+        .values('status')
+        .annotate(orders=Count('id'), revenue=Sum('total_amount'))
+        .order_by()
+    )
+    items = (
+        OrderItem.objects.filter(order__created_at__gte=start, order__created_at__lt=end)
+        .values('order__status')
+        .annotate(items=Sum('quantity'))
+        .order_by()
+    )
+
+    with write_atomic():
+        rows = _rollup_rows(
+            [dict(row, date=day) for row in orders],
+            [dict(row, date=day) for row in items],
+            'date',
+        )
+        OrderDailyRollup.objects.filter(date=day).exclude(
+            status__in=[row.status for row in rows]
+        ).delete()
+        if rows:
+            _save(rows)
+
+
+def order_days(queryset):
+    """Days touched by an Order queryset.
+
+    For changes made with queryset.update(), which sends no signals; collect
+    the days before the update in case it changes which rows match.
+    """
+    return list(queryset.order_by().dates('created_at', 'day'))
+
+
+def refresh_days(days):
+    for day in days:
+        refresh_day(day)
+
+
+def rebuild_rollups():
+    """Recompute every rollup row from the order tables in two aggregate queries.
+
+    Returns the number of rows written.
+    """
+    orders = (
+        Order.objects.annotate(day=TruncDate('created_at'))
+        .values('day', 'status')
+        .annotate(orders=Count('id'), revenue=Sum('total_amount'))
+        .order_by()
+    )
+    items = (
+        OrderItem.objects.annotate(day=TruncDate('order__created_at'))
+        .values('day', 'order__status')
+        .annotate(items=Sum('quantity'))
+        .order_by()
+    )
+    rows = _rollup_rows(orders, items, 'day')
+
+    with write_atomic():
+        OrderDailyRollup.objects.all().delete()
+        OrderDailyRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def _customer_stats(orders):
+    return orders.values('user').annotate(
+        order_count=Count('id'),
+        total_spent=Sum('total_amount'),
+        last_order_at=Max('created_at'),
+    ).order_by()
+
+
+def _stats_row(row):
+    return CustomerStats(
+        user_id=row['user'],
+        order_count=row['order_count'],
+        total_spent=row['total_spent'] or Decimal('0.00'),
+        last_order_at=row['last_order_at'],
+    )
+
+
+def refresh_customer(user_id):
+    """Recompute one customer's CustomerStats row from their orders."""
+    rows = list(_customer_stats(Order.objects.filter(user_id=user_id)))
+    if not rows:
+        CustomerStats.objects.filter(user_id=user_id).delete()
+        return
+    CustomerStats.objects.bulk_create(
+        [_stats_row(rows[0])],
+        update_conflicts=True,
+        update_fields=['order_count', 'total_spent', 'last_order_at', 'updated_at'],
+        **conflict_target(['user']),
+    )
+
+
+def refresh_customer_on_commit(user_id):
+    """Refresh a customer's stats once the current transaction commits."""
+    _on_commit(refresh_customer, user_id)
+
+
+def rebuild_customer_stats():
+    """Recompute every CustomerStats row in one aggregate query.
+
+    Returns the number of rows written.
+    """
+    rows = [_stats_row(row) for row in _customer_stats(Order.objects.all())]
+    with write_atomic():
+        CustomerStats.objects.all().delete()
+        CustomerStats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rollup_totals(since=None):
+    """Orders, revenue and items summed over the rollups, optionally from `since` (a date)."""
+    rollups = OrderDailyRollup.objects.all()
+    if since is not None:
+        rollups = rollups.filter(date__gte=since)
+    totals = rollups.aggregate(orders=Sum('orders'), revenue=Sum('revenue'), items=Sum('items'))
+    return {
+        'orders': totals['orders'] or 0,
+        'revenue': totals['revenue'] or Decimal('0.00'),
+        'items': totals['items'] or 0,
+    }
+
+
+def status_counts():
+    """[{'status': ..., 'count': ...}] across all days, busiest status first."""
+    return (
+        OrderDailyRollup.objects.values('status')
+        .annotate(count=Sum('orders'))
+        .filter(count__gt=0)
+        .order_by('-count')
+    )
+
+
+def daily_series(days):
+    """One dict per day for the last `days` days (oldest first), zero-filled."""
+    today = timezone.localdate()
+    first = today - timedelta(days=days - 1)
+    totals = {
+        row['date']: row
+        for row in OrderDailyRollup.objects.filter(date__gte=first)
+        .values('date')
+        .annotate(orders=Sum('orders'), revenue=Sum('revenue'), items=Sum('items'))
+        .order_by()
+    }
+    series = []
+    for offset in range(days):
+        day = first + timedelta(days=offset)
+        row = totals.get(day, {})
+        series.append({
+            'date': day,
+            'orders': row.get('orders', 0),
+            'revenue': row.get('revenue') or Decimal('0.00'),
+            'items': row.get('items', 0),
+        })
+    return series
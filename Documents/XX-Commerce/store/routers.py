@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+
+REPLICA = 'replica'
+PIN_COOKIE = 'pin_primary'
+
+_use_replica = ContextVar('use_replica', default=False)
+# Set by ReplicaPinMiddleware for the duration of a request
+_request_pin = ContextVar('request_pin', default=None)
+
+
+class _Pin:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def replica_reads():
+    """Route reads inside the block to the replica, if one is configured and the request is not pinned."""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def read_from_replica(view_func):
+    """Run a view's GET/HEAD requests under replica_reads(); other methods stay on the primary."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view_func(request, *args, **kwargs)
+        with replica_reads():
+            return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """Send reads made inside replica_reads() to the 'replica' alias.
+
+    Everything else, and every write, uses 'default'. A request that has
+    written, or follows one within REPLICA_PIN_SECONDS, reads from the
+    primary too, so nobody reads past their own writes through replica lag.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or not replica_configured():
+            return None
+        pin = _request_pin.get()
+        if pin is not None and (pin.pinned or pin.wrote):
+            return None
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        pin = _request_pin.get()
+        if pin is not None:
+            pin.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        if {obj1._state.db, obj2._state.db} <= {'default', REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary and gets its schema from it
+        return False if db == REPLICA else None
+
+
+class ReplicaPinMiddleware:
+    """Pin a visitor's reads to the primary for REPLICA_PIN_SECONDS after a request that wrote."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_configured():
+            return self.get_response(request)
+
+        pin = _Pin(pinned=PIN_COOKIE in request.COOKIES)
+        token = _request_pin.set(pin)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_pin.reset(token)
+        if pin.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
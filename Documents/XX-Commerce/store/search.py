@@ -0,0 +1,128 @@
+import re
+
+from django.db import connection
+from django.db.models import Q, Value
+from django.db.models.expressions import RawSQL
+
+
+FTS_TABLE = 'store_product_fts'
+SEARCH_FIELDS = ['name', 'short_description', 'description', 'sku']
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_backend():
+    """Return the full-text backend available for the default database."""
+    if connection.vendor in ('sqlite', 'mysql'):
+        return connection.vendor
+    return None
+
+
+def _tokens(query):
+    return _TOKEN_RE.findall(query or '')
+
+
+def _fts5_query(query):
+    """Build an FTS5 MATCH expression: every term must match, as a prefix."""
+    return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in _tokens(query))
+
+
+def _boolean_query(query):
+    """Build a MySQL boolean-mode expression: every term must match, as a prefix."""
+    return ' '.join('+{}*'.format(token) for token in _tokens(query))
+
+
+def search_products(queryset, query):
+    """Filter a Product queryset by the search index and annotate `search_rank`.
+
+    Lower `search_rank` is better on every backend, so callers can always
+    order by `search_rank` ascending.
+    """
+    backend = search_backend()
+
+    if backend == 'sqlite':
+        match = _fts5_query(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT rank FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = store_product.id',
+                [match],
+            )
+        )
+
+    if backend == 'mysql':
+        match = _boolean_query(query)
+        if not match:
+            return queryset.none()
+        columns = ', '.join(SEARCH_FIELDS)
+        return queryset.annotate(
+            search_rank=RawSQL(f'-MATCH({columns}) AGAINST (%s IN BOOLEAN MODE)', [match])
+        ).filter(search_rank__lt=0)
+
+    # No full-text support on this database, fall back to substring matching
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f'{field}__icontains': query})
+    return queryset.filter(condition).annotate(search_rank=Value(0))
+
+
+def index_product(product):
+    """Add or refresh a single product in the search index."""
+    if search_backend() != 'sqlite':
+        # MySQL maintains FULLTEXT indexes itself
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, short_description, description, sku) '
+            f'VALUES (%s, %s, %s, %s, %s)',
+            [product.pk, product.name, product.short_description, product.description, product.sku],
+        )
+
+
+def index_products(product_ids):
+    """Add or refresh many products in the search index with two statements."""
+    if search_backend() != 'sqlite' or not product_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', list(product_ids))
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, short_description, description, sku) '
+            f'SELECT id, name, short_description, description, sku FROM store_product '
+            f'WHERE id IN ({placeholders})',
+            list(product_ids),
+        )
+
+
+def remove_product(product_id):
+    """Drop a product from the search index."""
+    if search_backend() != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+
+def rebuild_index():
+    """Rebuild the whole search index from the product table.
+
+    Returns the number of indexed products.
+    """
+    backend = search_backend()
+    with connection.cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, short_description, description, sku) '
+                f'SELECT id, name, short_description, description, sku FROM store_product'
+            )
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        elif backend == 'mysql':
+            cursor.execute('OPTIMIZE TABLE store_product')
+            cursor.fetchall()
+        cursor.execute('SELECT COUNT(*) FROM store_product')
+        return cursor.fetchone()[0]
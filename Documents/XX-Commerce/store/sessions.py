@@ -0,0 +1,58 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBSessionStore
+from django.contrib.sessions.backends.db import SessionStore as DBSessionStore
+from django.contrib.sessions.middleware import SessionMiddleware
+
+
+REFRESHED_AT_KEY = '_refreshed_at'
+
+# Caches that live inside one process: every worker would hold its own copy
+# of a session, serving stale data and missing logouts made through another
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def shared_session_cache():
+    """Whether SESSION_CACHE_ALIAS names a cache every worker shares."""
+    return settings.CACHES[settings.SESSION_CACHE_ALIAS]['BACKEND'] not in PER_PROCESS_CACHES
+
+
+class SessionStore(CachedDBSessionStore if shared_session_cache() else DBSessionStore):
+    """Sessions that remember when they were last written, so an unchanged
+    session is only rewritten to slide its expiry now and then.
+
+    They are cached_db sessions (read from the cache, falling back to the
+    database) when the session cache is shared between workers, and plain
+    database sessions otherwise.
+    """
+
+    def needs_refresh(self):
+        """Whether SESSION_REFRESH_FRACTION of the session's age has passed since it was last saved."""
+        if self.is_empty():
+            return False
+        refreshed_at = self.get(REFRESHED_AT_KEY, 0)
+        return time.time() - refreshed_at >= settings.SESSION_REFRESH_FRACTION * self.get_expiry_age()
+
+    def save(self, must_create=False):
+        self._get_session(no_load=must_create)[REFRESHED_AT_KEY] = int(time.time())
+        super().save(must_create)
+
+
+class LazySessionMiddleware(SessionMiddleware):
+    """SessionMiddleware without a write on every request.
+
+    Sessions are saved when the request changes them, as usual, so nothing
+    is created for visitors that never store data. A session the request
+    read but left unchanged is saved again, renewing its expiry and cookie,
+    only once needs_refresh() says so. Requires SESSION_ENGINE = 'store.sessions'.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if session is not None and session.accessed and not session.modified and session.needs_refresh():
+            session.modified = True
+        return super().process_response(request, response)
@@ -0,0 +1,155 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Category, Product, ProductImage, Cart, CartItem, Order, OrderItem
+from .cache import bump_catalog_version
+from .cart_storage import get_storage, materialize_guest_cart
+from .page_cache import purge_tags
+from .reservations import release_cart_holds
+from .rollups import record_items, record_order, record_order_deleted, refresh_customer_on_commit
+from . import search
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, **kwargs):
+    """Keep the search index in step with product edits."""
+    search.index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_index(sender, instance, **kwargs):
+    """Drop deleted products from the search index."""
+    search.remove_product(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def reprice_carts_on_price_change(sender, instance, created, **kwargs):
+    """Refresh totals of active carts holding a product whose price changed."""
+    if not created and instance.price_changed:
+        Cart.recalculate_totals(Cart.objects.filter(is_active=True, items__product=instance))
+    instance._loaded_price = instance.price
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def update_cart_totals(sender, instance, **kwargs):
+    """Keep Cart.item_count and Cart.subtotal in step with its items."""
+    Cart.recalculate_totals(Cart.objects.filter(pk=instance.cart_id))
+
+
+@receiver(post_delete, sender=ProductImage)
+def refresh_primary_image_on_delete(sender, instance, **kwargs):
+    """Move the product's primary_image pointer off a deleted image."""
+    Product.refresh_primary_images(Product.objects.filter(pk=instance.product_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Any category or product change invalidates cached navigation and home blocks."""
+    bump_catalog_version()
+
+
+def _category_tags(path):
+    return [f'category:{pk}' for pk in path.split('/') if pk]
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def purge_product_pages(sender, instance, **kwargs):
+    """Purge the product's own pages and every listing it can appear in."""
+    tags = [f'product:{instance.pk}', 'catalog', *_category_tags(instance.category.path)]
+    if instance.is_featured:
+        tags.append('home')
+    purge_tags(*tags)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def purge_product_image_pages(sender, instance, **kwargs):
+    """Purge pages showing the product whose images changed."""
+    purge_tags(f'product:{instance.product_id}')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def purge_category_pages(sender, instance, **kwargs):
+    """Purge the category page, its ancestors' pages and cards that show its name."""
+    purge_tags(*_category_tags(instance.path))
+
+
+@receiver(pre_delete, sender=Cart)
+def release_holds_on_cart_delete(sender, instance, **kwargs):
+    """Return a deleted cart's held stock instead of letting the cascade drop it."""
+    release_cart_holds([instance.pk])
+
+
+@receiver(user_logged_in)
+def materialize_guest_cart_on_login(sender, request, user, **kwargs):
+    """Fold the visitor's guest cart into their account cart; the middleware drops the guest copy."""
+    if request is None:
+        return
+    lines = get_storage().load(request)
+    if lines:
+        materialize_guest_cart(user, lines)
+        request.guest_cart_merged = True
+    # Later reads in this request should see the account cart
+    request.__dict__.pop('_cached_cart', None)
+
+
+# Fields of Order and OrderItem that the daily rollups are built from
+ORDER_ROLLUP_FIELDS = {'created_at', 'status', 'total_amount'}
+ORDER_ITEM_ROLLUP_FIELDS = {'order', 'quantity'}
+
+
+def _rollup_fields_saved(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_rollup_values(sender, instance, update_fields=None, **kwargs):
+    """Read the stored values the rollups counted, so the save can apply just the difference."""
+    if not instance._state.adding and _rollup_fields_saved(update_fields, ORDER_ROLLUP_FIELDS):
+        instance._rollup_old = Order.objects.filter(pk=instance.pk).values_list(
+            'created_at', 'status', 'total_amount'
+        ).first()
+
+
+@receiver(post_save, sender=Order)
+def update_rollup_for_order(sender, instance, created, update_fields=None, **kwargs):
+    """Update the order's rollup row and its customer's stats after the change commits."""
+    if created or _rollup_fields_saved(update_fields, ORDER_ROLLUP_FIELDS):
+        record_order(instance, None if created else instance.__dict__.pop('_rollup_old', None))
+        refresh_customer_on_commit(instance.user_id)
+
+
+@receiver(post_delete, sender=Order)
+def update_rollup_for_deleted_order(sender, instance, **kwargs):
+    record_order_deleted(instance)
+    refresh_customer_on_commit(instance.user_id)
+
+
+@receiver(pre_save, sender=OrderItem)
+def remember_order_item_rollup_values(sender, instance, update_fields=None, **kwargs):
+    if not instance._state.adding and _rollup_fields_saved(update_fields, ORDER_ITEM_ROLLUP_FIELDS):
+        instance._rollup_old = OrderItem.objects.filter(pk=instance.pk).values_list(
+            'order_id', 'quantity'
+        ).first()
+
+
+@receiver(post_save, sender=OrderItem)
+def update_rollup_for_order_item(sender, instance, created, **kwargs):
+    """Item quantities feed the rollups too."""
+    old = None if created else instance.__dict__.pop('_rollup_old', None)
+    if old is not None:
+        record_items(old[0], -old[1])
+    if created or old is not None:
+        record_items(instance.order_id, instance.quantity)
+
+
+@receiver(post_delete, sender=OrderItem)
+def update_rollup_for_deleted_order_item(sender, instance, **kwargs):
+    record_items(instance.order_id, -instance.quantity)
@@ -1,3 +1,237 @@
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from django.utils import timezone
+
+from .checkout import _decrement_stock, place_order
+from .imports import import_products
+from .models import (
+    Address, Cart, CartItem, Category, CustomerStats, Order, OrderDailyRollup, OrderItem, Product,
+    StockReservation,
+)
+from .pagination import encode_cursor, paginate_keyset
+from .pricing import update_prices
+from .reservations import hold_stock
+from .rollups import rebuild_customer_stats, rebuild_rollups
+
+
+class StoreTestCase(TestCase):
+    """A customer with an address and a category to put products in."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'password')
+        self.address = Address.objects.create(
+            user=self.user, address_type='shipping', first_name='Sam', last_name='Shopper',
+            address_line_1='1 Main St', city='Springfield', state='IL', postal_code='62701',
+        )
+        self.category = Category.objects.create(name='Gadgets', slug='gadgets')
+
+    def make_product(self, sku, **fields):
+        fields = {'name': sku, 'slug': sku.lower(), 'price': Decimal('10.00'), 'stock_quantity': 10, **fields}
+        return Product.objects.create(sku=sku, category=self.category, **fields)
+
+
+class CheckoutTests(StoreTestCase):
+    def test_order_takes_stock(self):
+        product = self.make_product('SKU-1', stock_quantity=5)
+        cart = Cart.get_or_create_cart(self.user)
+        CartItem.objects.create(cart=cart, product=product, quantity=3)
+
+        order = place_order(self.user, cart, self.address, self.address)
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 2)
+        self.assertEqual(order.items.get().quantity, 3)
+        self.assertFalse(Cart.objects.get(pk=cart.pk).is_active)
+
+    def test_oversell_is_rejected(self):
+        product = self.make_product('SKU-1', stock_quantity=2)
+        cart = Cart.get_or_create_cart(self.user)
+        CartItem.objects.create(cart=cart, product=product, quantity=3)
+
+        with self.assertRaises(ValidationError):
+            place_order(self.user, cart, self.address, self.address)
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 2)
+        self.assertFalse(Order.objects.exists())
+
+    def test_stock_guard_rejects_stale_stock_levels(self):
+        # The rows say 5 in stock, but another checkout has since taken 4
+        product = self.make_product('SKU-1', stock_quantity=5)
+        Product.objects.filter(pk=product.pk).update(stock_quantity=1)
+
+        with self.assertRaises(ValidationError):
+            _decrement_stock([(product.pk, 3)], {product.pk: product}, {})
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 1)
+
+
+class HoldStockTests(StoreTestCase):
+    def hold(self, cart, product, quantity, expires_in):
+        StockReservation.objects.create(
+            cart=cart, product=product, quantity=quantity, expires_at=timezone.now() + expires_in,
+        )
+        Product.objects.filter(pk=product.pk).update(reserved_quantity=product.reserved_quantity + quantity)
+        product.refresh_from_db()
+
+    def test_renews_a_hold_the_sweep_released(self):
+        product = self.make_product('SKU-1', stock_quantity=3)
+        cart = Cart.get_or_create_cart(self.user)
+        other = Cart.get_or_create_cart(session_key='guest')
+        self.hold(cart, product, 2, timedelta(minutes=-1))
+        self.hold(other, product, 1, timedelta(minutes=-1))
+
+        hold_stock(cart, product, 3)
+
+        product.refresh_from_db()
+        self.assertEqual(product.reserved_quantity, 3)
+        hold = StockReservation.objects.get(cart=cart, product=product)
+        self.assertEqual(hold.quantity, 3)
+        self.assertFalse(hold.is_expired)
+        self.assertFalse(StockReservation.objects.filter(cart=other).exists())
+
+    def test_tight_stock_is_reported_not_crashed(self):
+        product = self.make_product('SKU-1', stock_quantity=3)
+        cart = Cart.get_or_create_cart(self.user)
+        other = Cart.get_or_create_cart(session_key='guest')
+        self.hold(cart, product, 2, timedelta(minutes=-1))
+        self.hold(other, product, 1, timedelta(minutes=10))
+
+        with self.assertRaises(ValidationError):
+            hold_stock(cart, product, 3)
+
+        product.refresh_from_db()
+        self.assertEqual(product.reserved_quantity, 3)
+
+
+class RollupTests(StoreTestCase):
+    def snapshot(self):
+        return (
+            sorted(OrderDailyRollup.objects.filter(orders__gt=0).values_list(
+                'date', 'status', 'orders', 'revenue', 'items'
+            )),
+            sorted(CustomerStats.objects.values_list('user_id', 'order_count', 'total_spent')),
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        rebuild_rollups()
+        rebuild_customer_stats()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_deltas_follow_order_changes(self):
+        product = self.make_product('SKU-1')
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(
+                user=self.user, subtotal=Decimal('20.00'), total_amount=Decimal('20.00'),
+                shipping_address=self.address, billing_address=self.address,
+            )
+            item = OrderItem.objects.create(
+                order=order, product=product, quantity=2, price=product.price,
+                product_name=product.name, product_sku=product.sku,
+            )
+        rollup = OrderDailyRollup.objects.get(status='pending')
+        self.assertEqual((rollup.orders, rollup.revenue, rollup.items), (1, Decimal('20.00'), 2))
+        self.assertEqual(CustomerStats.objects.get(user=self.user).order_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = 'shipped'
+            order.total_amount = Decimal('25.00')
+            order.save()
+            item.quantity = 3
+            item.save()
+        self.assertMatchesRebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        self.assertFalse(OrderDailyRollup.objects.filter(orders__gt=0).exists())
+        self.assertFalse(CustomerStats.objects.exists())
+
+    def test_checkout_counts_its_items(self):
+        product = self.make_product('SKU-1')
+        cart = Cart.get_or_create_cart(self.user)
+        CartItem.objects.create(cart=cart, product=product, quantity=4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.user, cart, self.address, self.address)
+
+        self.assertEqual(OrderDailyRollup.objects.get(status='pending').items, 4)
+        self.assertMatchesRebuild()
+
+
+class KeysetCursorTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        for number in range(5):
+            self.make_product(f'SKU-{number}', name=f'Product {number}', price=Decimal(10 + number))
+
+    def test_cursor_continues_its_ordering(self):
+        first = paginate_keyset(Product.objects.all(), ['price', 'id'], per_page=2)
+        second = paginate_keyset(Product.objects.all(), ['price', 'id'], first.next_cursor, per_page=2)
+        self.assertEqual([p.sku for p in second], ['SKU-2', 'SKU-3'])
+
+    def test_cursor_from_another_ordering_starts_over(self):
+        by_name = paginate_keyset(Product.objects.all(), ['name', 'id'], per_page=2)
+        page = paginate_keyset(Product.objects.all(), ['price', 'id'], by_name.next_cursor, per_page=2)
+        self.assertEqual([p.sku for p in page], ['SKU-0', 'SKU-1'])
+        self.assertFalse(page.has_previous)
+
+    def test_forged_cursor_starts_over(self):
+        forged = encode_cursor(['Product 1', 1], 'next', ['name', 'id'])[:-4] + 'AAAA'
+        page = paginate_keyset(Product.objects.all(), ['name', 'id'], forged, per_page=2)
+        self.assertEqual([p.sku for p in page], ['SKU-0', 'SKU-1'])
+
+
+class ImportTests(StoreTestCase):
+    def run_import(self, text, file_format='csv'):
+        return import_products(io.BytesIO(text.encode()), file_format)
+
+    def test_blank_cells_leave_fields_alone(self):
+        product = self.make_product('SKU-1', stock_quantity=7, description='Keep me')
+        result = self.run_import(
+            'sku,name,category,price,stock_quantity,is_active,description\n'
+            'SKU-1,Renamed,,,,,\n'
+            'SKU-2,New,Gadgets,5.00,,,\n'
+        )
+        self.assertEqual((result.created, result.updated, result.errors), (1, 1, []))
+
+        product.refresh_from_db()
+        self.assertEqual(product.name, 'Renamed')
+        self.assertEqual(product.stock_quantity, 7)
+        self.assertTrue(product.is_active)
+        self.assertEqual(product.price, Decimal('10.00'))
+        # A blank text cell clears the text
+        self.assertEqual(product.description, '')
+
+        new = Product.objects.get(sku='SKU-2')
+        self.assertTrue(new.is_active)
+        self.assertEqual(new.stock_quantity, 0)
+
+    def test_records_only_write_their_own_keys(self):
+        product = self.make_product('SKU-1', stock_quantity=7)
+        records = [{'sku': 'SKU-1', 'price': '12.00'}, {'sku': 'SKU-1', 'stock_quantity': 3}]
+        self.run_import(''.join(json.dumps(record) + '\n' for record in records), 'jsonl')
+
+        product.refresh_from_db()
+        self.assertEqual((product.price, product.stock_quantity, product.is_active), (Decimal('12.00'), 3, True))
+
+
+class PriceRoundingTests(StoreTestCase):
+    def test_rounds_half_up(self):
+        cents = self.make_product('SKU-1', price=Decimal('1.00'))
+        units = self.make_product('SKU-2', price=Decimal('2.50'))
+
+        update_prices(Product.objects.filter(pk=cents.pk), multiplier=Decimal('1.125'))
+        update_prices(Product.objects.filter(pk=units.pk), rounding='unit')
 
-# Create your tests here.
+        cents.refresh_from_db()
+        units.refresh_from_db()
+        self.assertEqual(cents.price, Decimal('1.13'))
+        self.assertEqual(units.price, Decimal('3.00'))
@@ -14,6 +14,9 @@ urlpatterns = [
     path('categories/', views.category_list, name='category_list'),
     path('categories/<slug:category_slug>/', views.product_list, name='category_detail'),
     
+    # Per-visitor data for cached pages
+    path('fragments/session/', views.session_fragment, name='session_fragment'),
+    
     # Cart
     path('cart/', views.cart_view, name='cart'),
     path('add-to-cart/<int:product_id>/', cart_views.add_to_cart, name='add_to_cart'),
@@ -2,65 +2,74 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Q, F
+from django.db.models import F
 from django.core.paginator import Paginator
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import never_cache
+from django.middleware.csrf import get_token
 from django.utils import timezone
 from decimal import Decimal
 import json
 
 from .models import (
-    Category, Product, ProductImage, Cart, CartItem, 
+    Category, Product, ProductImage, CartItem, 
     Order, OrderItem, Address, Coupon, Wishlist
 )
 from .forms import AddToCartForm, CheckoutForm, CouponForm, UserRegistrationForm, AddressForm
+from .cache import featured_products, navigation_categories
+from .cart_storage import GuestCart
+from .middleware import get_cart
+from .page_cache import add_cache_tags, cache_anonymous_page
+from .pagination import paginate_keyset
+from .search import search_products
 
 
+def _product_card_tags(products):
+    """Cache tags for a set of rendered product cards."""
+    tags = set()
+    for product in products:
+        tags.add(f'product:{product.id}')
+        tags.add(f'category:{product.category_id}')
+    return tags
+
+
+@cache_anonymous_page
 def home(request):
     """Home page with featured products and categories."""
-    featured_products = Product.objects.filter(
-        is_active=True, 
-        is_featured=True
-    ).select_related('category').prefetch_related('images')[:8]
-    
-    categories = Category.objects.filter(
-        is_active=True, 
-        parent__isnull=True
-    )[:6]
+    products = featured_products()
+    add_cache_tags(request, 'home', *_product_card_tags(products))
     
     context = {
-        'featured_products': featured_products,
-        'categories': categories,
+        'featured_products': products,
+        'categories': navigation_categories()[:6],
     }
     return render(request, 'store/home.html', context)
 
 
+@cache_anonymous_page
 def product_list(request, category_slug=None):
     """Product listing page with filtering and pagination."""
-    products = Product.objects.filter(is_active=True).select_related('category').prefetch_related('images')
+    products = Product.objects.filter(is_active=True).select_related('category', 'primary_image')
     
-    # Filter by category
+    # Filter by category, including the whole subtree below it
     if category_slug:
         category = get_object_or_404(Category, slug=category_slug, is_active=True)
-        products = products.filter(category=category)
-        # Include subcategories
-        subcategories = category.children.filter(is_active=True)
         products = products.filter(
-            Q(category=category) | Q(category__in=subcategories)
+            Category.subtree_filter(category.path, field='category__path'),
+            category__is_active=True,
         )
+        subcategories = category.children.filter(is_active=True)
+        breadcrumbs = category.get_ancestors()
     else:
         category = None
         subcategories = None
+        breadcrumbs = []
     
     # Search functionality
     search_query = request.GET.get('search', '')
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(sku__icontains=search_query)
-        )
+        products = search_products(products, search_query)
     
     # Filter by price range
     min_price = request.GET.get('min_price')
@@ -75,27 +84,43 @@ def product_list(request, category_slug=None):
     if in_stock:
         products = products.filter(stock_quantity__gt=0)
     
-    # Sorting
-    sort_by = request.GET.get('sort', 'created_at')
+    # Sorting (every ordering ends in id so it can drive keyset pagination)
+    sort_by = request.GET.get('sort', 'relevance' if search_query else 'created_at')
     sort_options = {
-        'created_at': '-created_at',
-        'name': 'name',
-        'price_asc': 'price',
-        'price_desc': '-price',
-        'popularity': '-created_at',  # Could be based on order count
+        'created_at': ['-created_at', '-id'],
+        'name': ['name', 'id'],
+        'price_asc': ['price', 'id'],
+        'price_desc': ['-price', '-id'],
+        'popularity': ['-created_at', '-id'],  # Could be based on order count
     }
-    if sort_by in sort_options:
-        products = products.order_by(sort_options[sort_by])
+    if search_query:
+        sort_options['relevance'] = ['search_rank', 'id']
+    ordering = sort_options.get(sort_by, sort_options['created_at'])
     
-    # Pagination
-    paginator = Paginator(products, 12)
+    # Pagination: numbered pages are kept for old links, cursors are the default
     page_number = request.GET.get('page')
-    products = paginator.get_page(page_number)
+    if page_number:
+        paginator = Paginator(products.order_by(*ordering), 12)
+        products = paginator.get_page(page_number)
+    else:
+        products = paginate_keyset(products, ordering, request.GET.get('cursor'), per_page=12)
+    
+    if category:
+        add_cache_tags(request, *(f'category:{pk}' for pk in category.path.split('/') if pk))
+    else:
+        add_cache_tags(request, 'catalog')
+    add_cache_tags(request, *_product_card_tags(products))
+    
+    query_params = request.GET.copy()
+    query_params.pop('page', None)
+    query_params.pop('cursor', None)
     
     context = {
+        'query_string': query_params.urlencode(),
         'products': products,
         'category': category,
         'subcategories': subcategories,
+        'breadcrumbs': breadcrumbs,
         'search_query': search_query,
         'sort_by': sort_by,
         'min_price': min_price,
@@ -105,10 +130,11 @@ def product_list(request, category_slug=None):
     return render(request, 'store/product_list.html', context)
 
 
+@cache_anonymous_page
 def product_detail(request, slug):
     """Product detail page."""
     product = get_object_or_404(
-        Product.objects.select_related('category').prefetch_related('images'),
+        Product.objects.select_related('category', 'primary_image').prefetch_related('images'),
         slug=slug, 
         is_active=True
     )
@@ -117,7 +143,14 @@ def product_detail(request, slug):
     related_products = Product.objects.filter(
         category=product.category,
         is_active=True
-    ).exclude(id=product.id)[:4]
+    ).exclude(id=product.id).select_related('primary_image')[:4]
+    
+    add_cache_tags(
+        request,
+        f'product:{product.id}',
+        *(f'category:{pk}' for pk in product.category.path.split('/') if pk),
+        *_product_card_tags(related_products),
+    )
     
     # Add to cart form
     add_to_cart_form = AddToCartForm()
@@ -132,6 +165,7 @@ def product_detail(request, slug):
     
     context = {
         'product': product,
+        'breadcrumbs': product.category.get_ancestors(include_self=True),
         'related_products': related_products,
         'add_to_cart_form': add_to_cart_form,
         'in_wishlist': in_wishlist,
@@ -139,26 +173,24 @@ def product_detail(request, slug):
     return render(request, 'store/product_detail.html', context)
 
 
+@never_cache
+def session_fragment(request):
+    """Per-visitor data for pages served from the shared page cache."""
+    cart = get_cart(request)
+    return JsonResponse({
+        'cart_items': cart.total_items if cart else 0,
+        'csrf_token': get_token(request),
+        'is_authenticated': request.user.is_authenticated,
+    })
+
+
 def cart_view(request):
     """Shopping cart page."""
-    if request.user.is_authenticated:
-        # First try to get existing active cart
-        cart = Cart.objects.filter(user=request.user, is_active=True).first()
-        if not cart:
-            # If no active cart exists, create a new one
-            cart = Cart.objects.create(user=request.user, is_active=True)
+    cart = get_cart(request)
+    if isinstance(cart, GuestCart):
+        cart_items = cart.items
     else:
-        session_key = request.session.session_key
-        if not session_key:
-            request.session.create()
-            session_key = request.session.session_key
-        # First try to get existing active cart
-        cart = Cart.objects.filter(session_key=session_key, is_active=True).first()
-        if not cart:
-            # If no active cart exists, create a new one
-            cart = Cart.objects.create(session_key=session_key, is_active=True)
-    
-    cart_items = cart.items.select_related('product').all()
+        cart_items = cart.items.select_related('product__primary_image') if cart else []
     
     # Coupon form
     coupon_form = CouponForm()
@@ -173,13 +205,8 @@ def cart_view(request):
 
 def category_list(request):
     """Category listing page."""
-    categories = Category.objects.filter(
-        is_active=True, 
-        parent__isnull=True
-    ).prefetch_related('children')
-    
     context = {
-        'categories': categories,
+        'categories': navigation_categories(),
     }
     return render(request, 'store/category_list.html', context)
 
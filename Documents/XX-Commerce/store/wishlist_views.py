@@ -61,7 +61,7 @@ def remove_from_wishlist(request, product_id):
 @login_required
 def wishlist(request):
     """User's wishlist page."""
-    wishlist_items = Wishlist.objects.filter(user=request.user).select_related('product')
+    wishlist_items = Wishlist.objects.filter(user=request.user).select_related('product__primary_image')
     
     context = {
         'wishlist_items': wishlist_items,
@@ -57,10 +57,12 @@ MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "corsheaders.middleware.CorsMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "store.sessions.LazySessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "store.routers.ReplicaPinMiddleware",
+    "store.middleware.CartMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -90,10 +92,25 @@ WSGI_APPLICATION = "xxcommerce.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# store.backends.sqlite3 is the stock SQLite backend plus the PRAGMAs below on
+# every connection, and BEGIN IMMEDIATE for store.db.write_atomic() blocks.
+# WAL lets readers run alongside the single writer; busy_timeout (ms) is how
+# long a writer queues for the lock before "database is locked".
+# Compare settings with `manage.py benchmark_sqlite`.
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "store.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            "pragmas": {
+                "journal_mode": config('SQLITE_JOURNAL_MODE', default='wal'),
+                "synchronous": config('SQLITE_SYNCHRONOUS', default='normal'),
+                "busy_timeout": config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+                "mmap_size": config('SQLITE_MMAP_SIZE', default=134217728, cast=int),
+                # Negative values are KiB
+                "cache_size": config('SQLITE_CACHE_SIZE', default=-20000, cast=int),
+            },
+        },
     }
 }
 
@@ -112,6 +129,62 @@ DATABASES = {
 #         },
 #     }
 # }
+# DATABASES["replica"] = {**DATABASES["default"], "HOST": config('REPLICA_DB_HOST')}
+
+# Optional read replica for the admin analytics and exports (see store.routers).
+# For SQLite, point REPLICA_DB_NAME at a copy of the database kept fresh with
+# `manage.py refresh_replica`; it is opened read-only
+REPLICA_DB_NAME = config('REPLICA_DB_NAME', default='')
+if REPLICA_DB_NAME:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": f"file:{REPLICA_DB_NAME}?mode=ro",
+        "OPTIONS": {
+            "pragmas": {
+                name: value for name, value in DATABASES["default"]["OPTIONS"]["pragmas"].items()
+                if name not in ("journal_mode", "synchronous")
+            },
+        },
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["store.routers.ReplicaRouter"]
+
+# Seconds a visitor's reads stay on the primary after a request that wrote
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Use a shared backend (e.g. django.core.cache.backends.redis.RedisCache) when
+# running several workers, so invalidation reaches every process.
+
+CACHES = {
+    "default": {
+        "BACKEND": config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        "LOCATION": config('CACHE_LOCATION', default='xxcommerce'),
+    }
+}
+
+# Seconds to keep category navigation and home page blocks
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=900, cast=int)
+
+# Seconds to keep anonymous home, listing and product pages (purged by tag on change)
+PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=600, cast=int)
+
+# Seconds a cart holds stock after an item is added; expired holds are freed
+# by `manage.py release_expired_reservations` (or on demand when stock runs short)
+STOCK_RESERVATION_TTL = config('STOCK_RESERVATION_TTL', default=900, cast=int)
+
+# Distinguishes order numbers generated on different hosts (0-35); give every
+# app server sharing a database its own value
+ORDER_NUMBER_NODE = config('ORDER_NUMBER_NODE', default=0, cast=int)
+
+# Seconds without progress after which a running export job is handed to another worker
+EXPORT_JOB_STALE_AFTER = config('EXPORT_JOB_STALE_AFTER', default=600, cast=int)
+# Finished export files hold customer data; they are kept outside MEDIA_ROOT
+# and only served through the staff export download view
+EXPORT_ROOT = config('EXPORT_ROOT', default=str(BASE_DIR / 'private' / 'exports'))
 
 
 # Password validation
@@ -216,5 +289,18 @@ CHANNEL_LAYERS = {
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 # Session Configuration
+# Sessions are only written when they change, or when an unchanged one is
+# older than SESSION_REFRESH_FRACTION of SESSION_COOKIE_AGE (which renews its
+# expiry). They are read from the cache first only when CACHES is a shared
+# backend; with the per-process LocMemCache they stay in the database. See
+# store.sessions
+SESSION_ENGINE = 'store.sessions'
 SESSION_COOKIE_AGE = 86400  # 24 hours
-SESSION_SAVE_EVERY_REQUEST = True
+SESSION_REFRESH_FRACTION = config('SESSION_REFRESH_FRACTION', default=0.25, cast=float)
+
+# Anonymous carts live outside the database until login: in a signed cookie
+# (store.cart_storage.SignedCookieGuestCartStorage) or in CACHES
+# (store.cart_storage.CacheGuestCartStorage)
+GUEST_CART_STORAGE = config('GUEST_CART_STORAGE', default='store.cart_storage.SignedCookieGuestCartStorage')
+# Seconds an anonymous cart is kept
+GUEST_CART_AGE = config('GUEST_CART_AGE', default=1209600, cast=int)
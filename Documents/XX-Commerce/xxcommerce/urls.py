@@ -29,7 +29,9 @@ urlpatterns = [
     path("admin/products/analytics/", admin_views.product_analytics, name="admin_product_analytics"),
     path("admin/orders/analytics/", admin_views.order_analytics, name="admin_order_analytics"),
     path("admin/bulk-operations/", admin_views.bulk_operations, name="admin_bulk_operations"),
+    path("admin/import/", admin_views.product_import, name="admin_product_import"),
     path("admin/export/", admin_views.export_data, name="admin_export_data"),
+    path("admin/export/<int:job_id>/download/", admin_views.export_download, name="admin_export_download"),
     # Main admin URL comes after custom URLs
     path("admin/", admin.site.urls),
     path("", include("store.urls")),